@@ -1,22 +1,23 @@
 """Gui app entry point."""
 
+import os
 import sys
+from multiprocessing import AuthenticationError
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import numpy as np
 import numpy.typing as npt
-import plotly.io as pio
 from PySide6.QtCore import Property, QObject, QSize, QUrl, Signal, Slot
 from PySide6.QtGui import QGuiApplication, QImage
 from PySide6.QtQml import QQmlApplicationEngine
 from PySide6.QtQuick import QQuickImageProvider
 
-from backend.exosky_backend import (
-    CreateStarChart,
-    ExoSkyBackend,
-    SelectionPlanet,
-    ThreeDStarChart,
-)
+from backend.backend_client import BackendClient
+from backend.chart_types import CreateStarChart, SelectionPlanet, ThreeDStarChart
+
+if TYPE_CHECKING:
+    from backend.exosky_backend import ExoSkyBackend
 
 CURRENT_DIRECTORY = Path(__file__).resolve().parent
 
@@ -49,11 +50,21 @@ class EarthNightSky(QObject):
 
     threed_nightsky_changed = Signal(str)
 
-    def __init__(self, parent: QObject | None = None) -> None:
-        """Initialize class."""
+    def __init__(
+        self,
+        parent: QObject | None = None,
+        backend: "ExoSkyBackend | BackendClient | None" = None,
+    ) -> None:
+        """Initialize class.
+
+        Pass a BackendClient to render on a shared backend server instead of
+        loading the star data in this process.
+        """
         super().__init__(parent)
         self._earth_nightsky: QImage = QImage()
         self._threed_nightsky: str = ""
+        # one backend per window, so its render cache lives across clicks
+        self._backend = backend if backend is not None else create_backend()
 
     def set_earth_nightsky(self, image: QImage) -> None:
         """Set stars from Earth's pov cone to the target exoplanet."""
@@ -74,7 +85,7 @@ class EarthNightSky(QObject):
         star_chart: CreateStarChart,
     ) -> None:
         """Have backend display stars within Earth/exoplanet cone."""
-        exo_planet = ExoSkyBackend().create_star_chart(select_exoplanet, star_chart)
+        exo_planet = self._backend.create_star_chart(select_exoplanet, star_chart)
         qexo_planet = to_q_image(exo_planet)
         # do we need to convert to QImage, when we can just pass the json str like 3D graph?
         # to be improved...
@@ -101,10 +112,9 @@ class EarthNightSky(QObject):
         threed_star_chart: ThreeDStarChart,
     ) -> None:
         """Have backend display stars in 3D within Earth/exoplanet cone."""
-        fig = ExoSkyBackend().create_threed_star_chart(
+        json_str = self._backend.create_threed_star_chart(
             select_exoplanet, threed_star_chart
         )
-        json_str = pio.to_json(fig)
         self.set_threed_nightsky(json_str)
 
 
@@ -117,7 +127,7 @@ class ExoSkyApp(QGuiApplication):
         name = "Exosky App"
         self.setApplicationDisplayName(name)
 
-        self.earth_pov = EarthNightSky()
+        self.earth_pov = EarthNightSky(backend=create_backend())
         self.provider = ImageProvider()
 
         self.engine = QQmlApplicationEngine()
@@ -134,6 +144,29 @@ class ExoSkyApp(QGuiApplication):
         self.earth_pov.update_earth_nightsky.emit()
 
 
+def create_backend() -> "ExoSkyBackend | BackendClient":
+    """Connect to the shared backend server if EXOSKY_BACKEND_ADDRESS is set.
+
+    Falls back to a backend in this process when the server cannot be reached,
+    the client does the same when it loses the server later on.
+    """
+    address = os.environ.get("EXOSKY_BACKEND_ADDRESS")
+    if address:
+        authkey = os.environ.get("EXOSKY_BACKEND_AUTHKEY")
+        try:
+            return BackendClient(
+                address, authkey=authkey.encode("utf-8") if authkey else None
+            )
+        except (OSError, AuthenticationError) as error:
+            print(f"Backend server {address} unreachable, rendering locally: {error}")
+    # imported here, so a thin client never loads the star data stack
+    from backend.exosky_backend import (  # pylint: disable=import-outside-toplevel
+        ExoSkyBackend,
+    )
+
+    return ExoSkyBackend()
+
+
 def to_q_image(image: npt.NDArray[np.uint8] | npt.NDArray[np.uint16]) -> QImage:
     """Convert to QImage."""
     height, width = image.shape[:2]
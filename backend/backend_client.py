@@ -0,0 +1,136 @@
+"""Thin client for the shared backend server.
+
+BackendClient offers the same chart methods as ExoSkyBackend, so the GUI can
+use either one. It only needs numpy, the star data stays in the server
+process. The 3D chart comes back as the plotly JSON string the GUI displays,
+without building a figure in between. When the server goes away the client
+connects again once and otherwise renders in its own process from then on.
+"""
+
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection
+
+import numpy as np
+import numpy.typing as npt
+
+from backend.backend_protocol import (
+    DEFAULT_ADDRESS,
+    KIND_STAR_CHART,
+    KIND_THREED_STAR_CHART,
+    STATUS_OK,
+    BackendServerError,
+    ChartRequest,
+    decode_response_header,
+    decompress_payload,
+    encode_request,
+)
+
+
+class BackendClient:
+    """Request star charts from a running backend server."""
+
+    def __init__(
+        self, address: str = DEFAULT_ADDRESS, authkey: bytes | None = None
+    ) -> None:
+        """Connect to the backend server."""
+        self.address = address
+        self._authkey = authkey
+        self._connection: Connection | None = Client(address, authkey=authkey)
+        # ExoSkyBackend, created once the server cannot be reached anymore
+        self._fallback = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_local(self) -> bool:
+        """True once charts are rendered in this process instead of the server."""
+        return self._fallback is not None
+
+    def close(self) -> None:
+        """Close the connection to the server."""
+        with self._lock:
+            self._disconnect()
+
+    def create_star_chart(self, select_exoplanet, star_chart) -> npt.NDArray[np.uint8]:
+        """Star chart image, rendered by the server."""
+        request = ChartRequest(
+            kind=KIND_STAR_CHART,
+            planet=select_exoplanet["planet"],
+            checked_earth_pov=bool(select_exoplanet["checked_earth_pov"]),
+            star_size=float(star_chart["star_size"]),
+            magnitude_limit=float(star_chart["magnitude_limit"]),
+            fov=float(star_chart["fov"]),
+            number_of_stars=0,
+        )
+        response = self._request(request)
+        if response is None:
+            return self._fallback.create_star_chart(select_exoplanet, star_chart)
+        header, payload = response
+        return np.frombuffer(payload, dtype=np.uint8).reshape(
+            header.height, header.width, header.channels
+        )
+
+    def create_threed_star_chart(self, select_exoplanet, threed_star_chart) -> str:
+        """3D star chart as plotly JSON, plotted by the server."""
+        request = ChartRequest(
+            kind=KIND_THREED_STAR_CHART,
+            planet=select_exoplanet["planet"],
+            checked_earth_pov=bool(select_exoplanet["checked_earth_pov"]),
+            star_size=0.0,
+            magnitude_limit=0.0,
+            fov=0.0,
+            number_of_stars=int(threed_star_chart["number_of_stars"]),
+        )
+        response = self._request(request)
+        if response is None:
+            return self._fallback.create_threed_star_chart(
+                select_exoplanet, threed_star_chart
+            )
+        return response[1].decode("utf-8")
+
+    def _request(self, request: ChartRequest):
+        """Send a request and receive the response header and payload.
+
+        Returns None once the server is unreachable, the request is then for
+        the local fallback backend.
+        """
+        with self._lock:
+            if self._fallback is not None:
+                return None
+            message = encode_request(request)
+            # charts do not change the server state, so a request is resent
+            # after a broken connection
+            for _ in range(2):
+                try:
+                    if self._connection is None:
+                        self._connection = Client(self.address, authkey=self._authkey)
+                    self._connection.send_bytes(message)
+                    header = decode_response_header(self._connection.recv_bytes())
+                    payload = self._connection.recv_bytes()
+                    break
+                except (AuthenticationError, EOFError, OSError) as error:
+                    self._disconnect()
+                    reason = error
+            else:
+                self._fall_back(reason)
+                return None
+        payload = decompress_payload(header.encoding, payload)
+        if header.status != STATUS_OK:
+            raise BackendServerError(payload.decode("utf-8"))
+        return header, payload
+
+    def _disconnect(self) -> None:
+        """Close the connection, the next request connects again."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _fall_back(self, reason: Exception) -> None:
+        """Render in this process from now on."""
+        print(f"Backend server {self.address} lost, rendering locally: {reason}")
+        # imported here, so a thin client only loads the star data stack if needed
+        from backend.exosky_backend import (  # pylint: disable=import-outside-toplevel
+            ExoSkyBackend,
+        )
+
+        self._fallback = ExoSkyBackend()
@@ -0,0 +1,143 @@
+"""Binary protocol between the backend server and its GUI clients.
+
+Messages go over a multiprocessing connection (a named pipe on Windows, a
+unix socket elsewhere), which already frames every message with its length.
+
+A request is one message: a fixed header followed by the utf-8 planet name.
+A response is two messages: a fixed header, then the payload. The payload is
+the RGBA pixels of a 2D chart, the plotly JSON of a 3D chart or the utf-8
+error message. Charts are zlib compressed, a 2D chart is mostly background
+and shrinks about tenfold, which matters far more than the compression time.
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from typing import NamedTuple, Tuple
+
+PROTOCOL_VERSION = 2
+
+KIND_STAR_CHART = 1
+KIND_THREED_STAR_CHART = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+ENCODING_IDENTITY = 0
+ENCODING_ZLIB = 1
+
+# fastest level, higher levels save little on star charts for twice the time
+ZLIB_LEVEL = 1
+
+if sys.platform == "win32":
+    DEFAULT_ADDRESS = r"\\.\pipe\exosky_backend"
+else:
+    DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), "exosky_backend.sock")
+
+# version, kind, checked_earth_pov, star_size, magnitude_limit, fov,
+# number_of_stars, length of the planet name
+REQUEST_HEADER = struct.Struct("<BB?dddIH")
+# status, kind, payload encoding, height, width, channels, payload length
+RESPONSE_HEADER = struct.Struct("<BBBIIBQ")
+
+
+class BackendServerError(RuntimeError):
+    """Request failed inside the backend server."""
+
+
+class ChartRequest(NamedTuple):
+    """Decoded chart request."""
+
+    kind: int
+    planet: str
+    checked_earth_pov: bool
+    star_size: float
+    magnitude_limit: float
+    fov: float
+    number_of_stars: int
+
+
+class ResponseHeader(NamedTuple):
+    """Decoded response header."""
+
+    status: int
+    kind: int
+    encoding: int
+    height: int
+    width: int
+    channels: int
+    payload_length: int
+
+
+def encode_request(request: ChartRequest) -> bytes:
+    """Pack a chart request into one message."""
+    planet = request.planet.encode("utf-8")
+    return (
+        REQUEST_HEADER.pack(
+            PROTOCOL_VERSION,
+            request.kind,
+            request.checked_earth_pov,
+            request.star_size,
+            request.magnitude_limit,
+            request.fov,
+            request.number_of_stars,
+            len(planet),
+        )
+        + planet
+    )
+
+
+def decode_request(message: bytes) -> ChartRequest:
+    """Unpack a chart request message."""
+    if len(message) < REQUEST_HEADER.size:
+        raise ValueError("request message is too short")
+    (
+        version,
+        kind,
+        checked_earth_pov,
+        star_size,
+        magnitude_limit,
+        fov,
+        number_of_stars,
+        planet_length,
+    ) = REQUEST_HEADER.unpack_from(message)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"unsupported protocol version {version}")
+    if kind not in (KIND_STAR_CHART, KIND_THREED_STAR_CHART):
+        raise ValueError(f"unknown request kind {kind}")
+    planet = message[REQUEST_HEADER.size : REQUEST_HEADER.size + planet_length]
+    return ChartRequest(
+        kind=kind,
+        planet=planet.decode("utf-8"),
+        checked_earth_pov=checked_earth_pov,
+        star_size=star_size,
+        magnitude_limit=magnitude_limit,
+        fov=fov,
+        number_of_stars=number_of_stars,
+    )
+
+
+def compress_payload(payload: bytes) -> Tuple[int, bytes]:
+    """Compress a chart payload, return the encoding and the encoded bytes."""
+    return ENCODING_ZLIB, zlib.compress(payload, ZLIB_LEVEL)
+
+
+def decompress_payload(encoding: int, payload: bytes) -> bytes:
+    """Undo compress_payload."""
+    if encoding == ENCODING_IDENTITY:
+        return payload
+    if encoding == ENCODING_ZLIB:
+        return zlib.decompress(payload)
+    raise ValueError(f"unknown payload encoding {encoding}")
+
+
+def encode_response_header(header: ResponseHeader) -> bytes:
+    """Pack a response header message."""
+    return RESPONSE_HEADER.pack(*header)
+
+
+def decode_response_header(message: bytes) -> ResponseHeader:
+    """Unpack a response header message."""
+    return ResponseHeader(*RESPONSE_HEADER.unpack(message))
@@ -0,0 +1,346 @@
+"""Shared backend server for several GUI clients on one machine.
+
+The server loads the star cones of every planet once into shared memory and
+renders charts for all connected clients, so memory does not grow with the
+number of GUIs. The sorted star indexes are built once per cone and shared as
+well, each client only keeps the selection and raster of its current chart.
+Finished charts are shared through one render cache. Start it from the repository root with
+
+    python -m backend.backend_server
+
+and point the GUI at it with the EXOSKY_BACKEND_ADDRESS environment variable.
+Other local processes can attach to the same catalogs without copying them,
+see SharedStarCatalog.manifest and attach_star_table.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import weakref
+from multiprocessing import AuthenticationError, resource_tracker, shared_memory
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backend.backend_protocol import (
+    DEFAULT_ADDRESS,
+    ENCODING_IDENTITY,
+    KIND_STAR_CHART,
+    STATUS_ERROR,
+    STATUS_OK,
+    ChartRequest,
+    ResponseHeader,
+    compress_payload,
+    decode_request,
+    encode_response_header,
+)
+from backend.chart_session import StarIndex
+from backend.chart_types import CreateStarChart, SelectionPlanet, ThreeDStarChart
+from backend.exosky_backend import (
+    PLANET_FILES,
+    ExoSkyBackend,
+    build_star_index,
+    dataset_version,
+    read_star_data,
+)
+from backend.render_cache import RenderCache
+from backend.star_table import STAR_DTYPES, StarTable
+
+# an attaching process must not unlink the segments of the server on exit
+_HAS_TRACK_OPTION = sys.version_info >= (3, 13)
+
+
+def share_star_table(
+    table: StarTable,
+) -> Tuple[StarTable, List[shared_memory.SharedMemory]]:
+    """Copy a table into shared memory, one segment per column."""
+    segments = []
+    columns = {}
+    for name in STAR_DTYPES:
+        column = table[name]
+        segment = shared_memory.SharedMemory(create=True, size=max(column.nbytes, 1))
+        columns[name] = np.ndarray(column.shape, dtype=column.dtype, buffer=segment.buf)
+        columns[name][...] = column
+        segments.append(segment)
+    return StarTable(columns), segments
+
+
+def attach_star_table(
+    segment_names: Dict[str, str], length: int
+) -> Tuple[StarTable, List[shared_memory.SharedMemory]]:
+    """Table over the shared segments of another process, without copying.
+
+    The segment names come from SharedStarCatalog.manifest. The caller closes
+    the returned segments once it no longer uses the table.
+    """
+    segments = []
+    columns = {}
+    for name, dtype in STAR_DTYPES.items():
+        if _HAS_TRACK_OPTION:
+            segment = shared_memory.SharedMemory(name=segment_names[name], track=False)
+        else:
+            segment = shared_memory.SharedMemory(name=segment_names[name])
+            if os.name == "posix":
+                # the resource tracker would unlink it when this process exits
+                resource_tracker.unregister(
+                    segment._name, "shared_memory"  # pylint: disable=protected-access
+                )
+        columns[name] = np.ndarray(length, dtype=dtype, buffer=segment.buf)
+        segments.append(segment)
+    return StarTable(columns), segments
+
+
+class SharedStarCatalog:
+    """Star cones of all planets, loaded once into shared memory.
+
+    A planet is loaded again when its dataset version changes. A segment of
+    a replaced table is removed as soon as no array in this process refers to
+    its column anymore, i.e. once the sessions using it are gone. Processes
+    attached to it keep their own mapping.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty catalog."""
+        self._tables: Dict[str, Dict[str, StarTable]] = {}
+        self._segments: Dict[str, Dict[str, List[shared_memory.SharedMemory]]] = {}
+        self._versions: Dict[str, str] = {}
+        self._indexes: Dict[Tuple[str, bool], StarIndex] = {}
+        # every segment not removed yet, current or replaced
+        self._mapped: Dict[str, shared_memory.SharedMemory] = {}
+        # reentrant, garbage collection may release a segment while it is held
+        self._lock = threading.RLock()
+
+    def star_data(self, select_exoplanet: SelectionPlanet) -> Dict[str, StarTable]:
+        """Drop-in replacement of read_star_data, served from shared memory."""
+        planet = select_exoplanet["planet"]
+        version = dataset_version(select_exoplanet)
+        with self._lock:
+            if self._versions.get(planet) != version:
+                self._load(select_exoplanet, version)
+            return dict(self._tables[planet])
+
+    def star_index(self, select_exoplanet: SelectionPlanet) -> StarIndex:
+        """Sorted index of the selected cone, built once and shared by all clients."""
+        planet = select_exoplanet["planet"]
+        key = (planet, bool(select_exoplanet["checked_earth_pov"]))
+        version = dataset_version(select_exoplanet)
+        with self._lock:
+            if self._versions.get(planet) != version:
+                self._load(select_exoplanet, version)
+            index = self._indexes.get(key)
+            if index is None:
+                index = build_star_index(select_exoplanet, self._tables[planet])
+                self._indexes[key] = index
+            return index
+
+    def preload(self) -> None:
+        """Load the cones of every known planet."""
+        for planet in PLANET_FILES:
+            self.star_data(SelectionPlanet(planet=planet, checked_earth_pov=False))
+
+    def manifest(self) -> Dict[str, Dict[str, Dict]]:
+        """Segment names and lengths of every loaded cone, for attach_star_table."""
+        with self._lock:
+            return {
+                planet: {
+                    cone: {
+                        "length": len(self._tables[planet][cone]),
+                        "segments": {
+                            name: segment.name
+                            for name, segment in zip(STAR_DTYPES, segments)
+                        },
+                    }
+                    for cone, segments in cones.items()
+                }
+                for planet, cones in self._segments.items()
+            }
+
+    def close(self) -> None:
+        """Remove all shared memory segments.
+
+        Columns still used by a session stay mapped in this process until the
+        session is gone, the memory is freed once every process let go of it.
+        """
+        with self._lock:
+            self._tables.clear()
+            self._segments.clear()
+            self._versions.clear()
+            self._indexes.clear()
+            for segment in self._mapped.values():
+                segment.unlink()
+            self._mapped.clear()
+
+    def _load(self, select_exoplanet: SelectionPlanet, version: str) -> None:
+        """Read a planet's cones from disk into new shared segments."""
+        planet = select_exoplanet["planet"]
+        tables = {}
+        segments = {}
+        for cone, table in read_star_data(select_exoplanet).items():
+            tables[cone], segments[cone] = share_star_table(table)
+            for name, segment in zip(STAR_DTYPES, segments[cone]):
+                self._mapped[segment.name] = segment
+                # views held by sessions keep the column array alive
+                finalizer = weakref.finalize(tables[cone][name], self._release, segment)
+                # at exit close removes the segments, the mappings go with the process
+                finalizer.atexit = False
+        self._tables[planet] = tables
+        self._segments[planet] = segments
+        self._versions[planet] = version
+        for pov in (False, True):
+            self._indexes.pop((planet, pov), None)
+
+    def _release(self, segment: shared_memory.SharedMemory) -> None:
+        """Unmap and remove a segment whose column is no longer referenced."""
+        segment.close()
+        with self._lock:
+            if self._mapped.pop(segment.name, None) is not None:
+                segment.unlink()
+
+
+class BackendServer:
+    """Serve star chart requests of all local GUI clients from one process."""
+
+    def __init__(
+        self,
+        address: str = DEFAULT_ADDRESS,
+        authkey: bytes | None = None,
+        cache: RenderCache | None = None,
+    ) -> None:
+        """Initialize the server, catalogs are loaded on first use or by preload."""
+        self.address = address
+        self.authkey = authkey
+        self.catalog = SharedStarCatalog()
+        # shared by all clients, finished charts of one are served to the others
+        self.cache = cache if cache is not None else RenderCache()
+
+    def serve_forever(self) -> None:
+        """Accept clients until interrupted, one thread per client."""
+        self._claim_address()
+        with Listener(self.address, authkey=self.authkey) as listener:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, EOFError, OSError) as error:
+                    print(f"Rejected client: {error}")
+                    continue
+                threading.Thread(
+                    target=self._serve_client, args=(connection,), daemon=True
+                ).start()
+
+    def _claim_address(self) -> None:
+        """Refuse to replace a running server, remove the socket of a dead one."""
+        try:
+            # no authkey, a server with one rejects the probe after accepting it
+            Client(self.address).close()
+        except OSError:
+            if sys.platform != "win32" and os.path.exists(self.address):
+                # left over from a server that did not shut down cleanly
+                os.unlink(self.address)
+            return
+        raise RuntimeError(f"another backend server is serving on {self.address}")
+
+    def _serve_client(self, connection: Connection) -> None:
+        """Answer requests of one client until it disconnects.
+
+        Every client gets its own backend, so its chart session follows only
+        its own slider moves and is only used by this thread.
+        """
+        backend = self._client_backend()
+        with connection:
+            while True:
+                try:
+                    message = connection.recv_bytes()
+                    self._handle(backend, connection, message)
+                except (EOFError, OSError):
+                    return
+
+    def _client_backend(self) -> ExoSkyBackend:
+        """Backend of one client on the shared catalog, indexes and cache."""
+        return ExoSkyBackend(
+            cache=self.cache,
+            star_data=self.catalog.star_data,
+            star_index=self.catalog.star_index,
+        )
+
+    def _handle(
+        self, backend: ExoSkyBackend, connection: Connection, message: bytes
+    ) -> None:
+        """Render one request and send the response."""
+        try:
+            request = decode_request(message)
+            header, payload = self._render(backend, request)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # report to the client instead of dropping its connection
+            payload = str(error).encode("utf-8")
+            header = ResponseHeader(
+                STATUS_ERROR, 0, ENCODING_IDENTITY, 0, 0, 0, len(payload)
+            )
+        connection.send_bytes(encode_response_header(header))
+        connection.send_bytes(payload)
+
+    def _render(
+        self, backend: ExoSkyBackend, request: ChartRequest
+    ) -> Tuple[ResponseHeader, bytes]:
+        """Run the request on the backend of the client."""
+        select_exoplanet = SelectionPlanet(
+            planet=request.planet, checked_earth_pov=request.checked_earth_pov
+        )
+        if request.kind == KIND_STAR_CHART:
+            image = backend.create_star_chart(
+                select_exoplanet,
+                CreateStarChart(
+                    star_size=request.star_size,
+                    magnitude_limit=request.magnitude_limit,
+                    fov=request.fov,
+                ),
+            )
+            image = np.ascontiguousarray(image, dtype=np.uint8)
+            height, width, channels = image.shape
+            # zlib reads the buffer byte by byte, so flatten it first
+            encoding, payload = compress_payload(image.reshape(-1).data)
+            header = ResponseHeader(
+                STATUS_OK, request.kind, encoding, height, width, channels, len(payload)
+            )
+            return header, payload
+
+        fig_json = backend.create_threed_star_chart(
+            select_exoplanet,
+            ThreeDStarChart(number_of_stars=request.number_of_stars),
+        )
+        encoding, payload = compress_payload(fig_json.encode("utf-8"))
+        header = ResponseHeader(
+            STATUS_OK, request.kind, encoding, 0, 0, 0, len(payload)
+        )
+        return header, payload
+
+
+def main() -> None:
+    """Server entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--address", default=DEFAULT_ADDRESS)
+    parser.add_argument(
+        "--cache-dir", default=None, help="also keep rendered charts on disk"
+    )
+    args = parser.parse_args()
+    # the key is shared through the environment to keep it off the command line
+    authkey = os.environ.get("EXOSKY_BACKEND_AUTHKEY")
+
+    server = BackendServer(
+        address=args.address,
+        authkey=authkey.encode("utf-8") if authkey else None,
+        cache=RenderCache(cache_dir=args.cache_dir),
+    )
+    try:
+        server.catalog.preload()
+        print(f"Exosky backend serving on {args.address}")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Exosky backend stopped")
+    finally:
+        server.catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Stateful star chart session for incremental FOV and magnitude updates.
+
+A StarIndex keeps the stars of one cone sorted by distance from the planet and
+by magnitude. Moving the FOV or magnitude limit of a session then only looks
+at the stars between the old and new bound, instead of filtering the whole
+cone again. The index is read-only, so many sessions can share one.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
+
+from backend.chunked_execution import fov_half_width
+from backend.star_table import StarTable
+
+
+class SelectionDelta(NamedTuple):
+    """Stars that entered or left the selection with the last update."""
+
+    entering: npt.NDArray[np.intp]
+    leaving: npt.NDArray[np.intp]
+
+
+class StarIndex:
+    """Stars of one cone sorted by FOV offset from the planet and by magnitude.
+
+    The FOV is a square centred on the planet, so a star is inside when the
+    larger of its ra and dec offsets is below fov / 2. Sorting the stars by
+    that offset and by magnitude turns both filters into prefixes of a sorted
+    index. The arrays are read-only and safe to share between threads.
+    """
+
+    __slots__ = (
+        "stars",
+        "planet_ra",
+        "planet_dec",
+        "half_width",
+        "fov_order",
+        "mag_order",
+    )
+
+    def __init__(self, stars: StarTable, planet_ra: float, planet_dec: float) -> None:
+        """Build the sorted indexes, the sorts run once per cone."""
+        self.stars = stars
+        self.planet_ra = planet_ra
+        self.planet_dec = planet_dec
+        self.half_width = fov_half_width(stars.ra, stars.dec, planet_ra, planet_dec)
+        # NaN sorts last, so stars without position or magnitude never enter
+        self.fov_order = np.argsort(self.half_width, kind="stable")
+        self.mag_order = np.argsort(stars.mag, kind="stable")
+        for array in (self.half_width, self.fov_order, self.mag_order):
+            array.flags.writeable = False
+
+    def __len__(self) -> int:
+        """Number of stars."""
+        return len(self.stars)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index, without the stars."""
+        return self.half_width.nbytes + self.fov_order.nbytes + self.mag_order.nbytes
+
+
+class StarChartSession:
+    """Selection and raster of one planet's star chart, updated incrementally.
+
+    A slider move becomes a band of the StarIndex between two binary
+    searches. Besides the shared index a session only holds its selection
+    mask and its figure. A session is not thread safe, use one per GUI
+    thread or server client.
+    """
+
+    def __init__(
+        self,
+        index: StarIndex,
+        planet_name: str,
+        checked_earth_pov: bool,
+        dataset_version: str = "",
+        dpi: int = 300,
+    ) -> None:
+        """Initialize the session on a sorted index."""
+        self.stars = index.stars
+        self.dataset_version = dataset_version
+        self._index = index
+
+        self._selected = np.zeros(len(index), dtype=np.bool_)
+        self._fov: float = 0.0
+        self._magnitude_limit: float = -np.inf
+        self._fov_count = 0
+        self._mag_count = 0
+
+        self._planet_ra = index.planet_ra
+        self._planet_dec = index.planet_dec
+        self._target_planet = "Earth" if checked_earth_pov else planet_name
+        self._pending_entering: list[npt.NDArray[np.intp]] = []
+        self._needs_full_redraw = True
+        self._drawn_star_size: float | None = None
+        self._label_bbox = None
+        self._label_background = None
+        self._setup_figure(planet_name, checked_earth_pov, dpi)
+
+    @property
+    def index(self) -> StarIndex:
+        """Sorted index the session works on."""
+        return self._index
+
+    @property
+    def fov(self) -> float:
+        """Current field of view in degrees."""
+        return self._fov
+
+    @property
+    def magnitude_limit(self) -> float:
+        """Current faintest displayed magnitude."""
+        return self._magnitude_limit
+
+    @property
+    def selected(self) -> npt.NDArray[np.intp]:
+        """Indexes of the selected stars in ascending order."""
+        return np.flatnonzero(self._selected)
+
+    def selection(self) -> StarTable:
+        """Selected stars as a table."""
+        return self.stars[self._selected]
+
+    def update(self, fov: float, magnitude_limit: float) -> SelectionDelta:
+        """Move the FOV and magnitude limit and return the stars that changed."""
+        # the binary searches and the membership test below must compare the
+        # same values, otherwise stars at a bound drift out of the counted band
+        index = self._index
+        half_fov = index.half_width.dtype.type(fov / 2)
+        limit = self.stars.mag.dtype.type(magnitude_limit)
+        # the sorter avoids keeping sorted copies of the columns
+        fov_count = int(
+            np.searchsorted(
+                index.half_width, half_fov, side="left", sorter=index.fov_order
+            )
+        )
+        mag_count = int(
+            np.searchsorted(self.stars.mag, limit, side="right", sorter=index.mag_order)
+        )
+
+        # only stars between the old and new bound can change membership
+        low, high = sorted((self._fov_count, fov_count))
+        fov_band = index.fov_order[low:high]
+        low, high = sorted((self._mag_count, mag_count))
+        mag_band = index.mag_order[low:high]
+        if fov_band.size and mag_band.size:
+            candidates = np.union1d(fov_band, mag_band)
+        else:
+            candidates = fov_band if fov_band.size else mag_band
+
+        now_selected = (index.half_width[candidates] < half_fov) & (
+            self.stars.mag[candidates] <= limit
+        )
+        was_selected = self._selected[candidates]
+        entering = candidates[now_selected & ~was_selected]
+        leaving = candidates[was_selected & ~now_selected]
+        self._selected[candidates] = now_selected
+
+        if fov != self._fov or leaving.size:
+            self._needs_full_redraw = True
+        elif entering.size:
+            self._pending_entering.append(entering)
+
+        self._fov = fov
+        self._magnitude_limit = magnitude_limit
+        self._fov_count = fov_count
+        self._mag_count = mag_count
+        return SelectionDelta(entering=entering, leaving=leaving)
+
+    def render(self, star_size: float) -> npt.NDArray[np.uint8]:
+        """Return the star chart as an RGBA image.
+
+        Stars are drawn from bright to faint. When stars only entered since
+        the last render they are all fainter than the drawn ones, so drawing
+        them on top of the previous raster gives the same image as a full
+        redraw. Otherwise the chart is redrawn from the current selection.
+        """
+        if self._needs_full_redraw or star_size != self._drawn_star_size:
+            self._draw_full(star_size)
+        elif self._pending_entering:
+            self._draw_entering(np.concatenate(self._pending_entering), star_size)
+        self._pending_entering = []
+        return np.array(self._canvas.buffer_rgba())
+
+    def close(self) -> None:
+        """Free the raster now, the session cannot render afterwards."""
+        # the figure and its canvas reference each other, so without this the
+        # raster would wait for the cyclic garbage collector
+        self._canvas.renderer = None
+        self._label_background = None
+
+    def _marker_size(
+        self, index: npt.NDArray[np.intp], star_size: float
+    ) -> npt.NDArray[np.float64]:
+        """Adjust size of marker based on magnitude."""
+        return 10 ** (self.stars.mag[index] / -2.5) * star_size
+
+    def _setup_figure(
+        self, planet_name: str, checked_earth_pov: bool, dpi: int
+    ) -> None:
+        """Build the figure once, later renders only update the stars."""
+        self._figure = Figure(figsize=(8, 8), facecolor="#041A40", dpi=dpi)
+        self._canvas = FigureCanvasAgg(self._figure)
+        self._axes = self._figure.add_subplot()
+        # the stars and the label are animated, so canvas.draw leaves them out
+        # and they can be drawn over a saved background of the static parts
+        self._stars_artist = self._axes.scatter(
+            [], [], s=[], color="white", marker=".", zorder=2, animated=True
+        )
+
+        self._label = None
+        if checked_earth_pov:
+            circle = Circle(
+                (self._planet_ra, self._planet_dec),
+                radius=0.3,
+                color="red",
+                fill=False,
+                linewidth=2,
+                zorder=1,
+            )
+            self._axes.add_patch(circle)
+            self._label = self._axes.text(
+                self._planet_ra + 0.5,
+                self._planet_dec,
+                planet_name,
+                color="yellow",
+                fontsize=10,
+                ha="left",
+                va="center",
+                animated=True,
+            )
+
+        self._axes.set_facecolor("black")
+        self._axes.set_aspect("equal")
+        self._axes.margins(x=0, y=0)
+        self._axes.tick_params(labelcolor="white")
+        self._axes.set_xlabel("Right Ascension", color="white")
+        self._axes.set_ylabel("Declination", color="white")
+
+    def _draw_full(self, star_size: float) -> None:
+        """Redraw the whole chart from the current selection."""
+        half_fov = self._fov / 2
+        self._axes.set_xlim(self._planet_ra - half_fov, self._planet_ra + half_fov)
+        self._axes.set_ylim(self._planet_dec - half_fov, self._planet_dec + half_fov)
+        # the render cache treats 30 and 30.0 as one chart, so title them alike
+        self._axes.set_title(
+            f"Star Chart from {self._target_planet} with fov of {float(self._fov)}",
+            color="yellow",
+        )
+        self._figure.tight_layout(pad=0.2)
+        self._canvas.draw()
+        if self._label is not None:
+            # a little wider for the antialiased edge of the glyphs
+            self._label_bbox = self._label.get_window_extent(
+                self._canvas.get_renderer()
+            ).padded(2)
+
+        # selected stars in (magnitude, index) order, the mag order is stable
+        mag_order = self._index.mag_order
+        in_mag_order = mag_order[self._selected[mag_order]]
+        self._draw_stars(in_mag_order, star_size)
+        self._needs_full_redraw = False
+        self._drawn_star_size = star_size
+
+    def _draw_entering(self, index: npt.NDArray[np.intp], star_size: float) -> None:
+        """Draw newly selected stars on top of the previous stars."""
+        if self._label is not None:
+            # drop the label, it is drawn again once above all stars
+            self._canvas.restore_region(self._label_background)
+        in_mag_order = index[np.lexsort((index, self.stars.mag[index]))]
+        self._draw_stars(in_mag_order, star_size)
+
+    def _draw_stars(self, index: npt.NDArray[np.intp], star_size: float) -> None:
+        """Draw stars over the canvas, keep the result and draw the label."""
+        self._stars_artist.set_offsets(
+            np.column_stack((self.stars.ra[index], self.stars.dec[index]))
+        )
+        self._stars_artist.set_sizes(self._marker_size(index, star_size))
+        self._axes.draw_artist(self._stars_artist)
+        if self._label is not None:
+            # only the label covers stars, so only its region is kept
+            self._label_background = self._canvas.copy_from_bbox(self._label_bbox)
+            self._axes.draw_artist(self._label)
@@ -0,0 +1,28 @@
+"""Chart parameters shared by the GUI, the backend and the backend server.
+
+Only typing definitions live here, so the thin GUI client can import them
+without pulling in the star data stack.
+"""
+
+from typing import TypedDict
+
+
+class SelectionPlanet(TypedDict):
+    """Allow the user to select planet."""
+
+    planet: str
+    checked_earth_pov: bool
+
+
+class CreateStarChart(TypedDict):
+    """Allow the user to view how stars can be displayed."""
+
+    star_size: int | float
+    magnitude_limit: int | float
+    fov: int | float
+
+
+class ThreeDStarChart(TypedDict):
+    """Allow the user to view 3D star chart."""
+
+    number_of_stars: int
@@ -0,0 +1,328 @@
+"""Chunked multi-core execution for star arrays.
+
+Star cones hold up to 500000 rows, so coordinate transforms and filters are
+split into cache-sized blocks. Each block writes straight into a preallocated
+output array, so the result is assembled without concatenating partial copies.
+NumPy releases the GIL inside its ufunc loops, so the blocks run on one
+thread pool shared by every caller. Kernels that hold the GIL can run on a
+process pool over shared memory with process_map_chunks instead.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+# 32768 float64 values = 256 KiB per column, which keeps a few input and
+# output columns of one block inside a typical per-core L2 cache
+DEFAULT_CHUNK_SIZE = 32768
+
+ChunkKernel = Callable[..., None]
+
+_pool: ThreadPoolExecutor | None = None
+_process_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    """Number of threads in the shared pool."""
+    return os.cpu_count() or 1
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    """Thread pool reused by every map_chunks call, created on first use."""
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=default_workers(), thread_name_prefix="star_chunks"
+            )
+        return _pool
+
+
+def _shared_process_pool() -> ProcessPoolExecutor:
+    """Process pool reused by every process_map_chunks call, created on first use."""
+    global _process_pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn like on Windows, forking a process with threads is unsafe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=default_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def chunk_bounds(
+    length: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[Tuple[int, int]]:
+    """Split range(length) into (start, stop) blocks of at most chunk_size."""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    return [
+        (start, min(start + chunk_size, length))
+        for start in range(0, length, chunk_size)
+    ]
+
+
+def map_chunks(
+    kernel: ChunkKernel,
+    inputs: Sequence[npt.NDArray],
+    outputs: Sequence[npt.NDArray],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int | None = None,
+) -> None:
+    """Run kernel(*input_blocks, *output_blocks) over every block on the shared pool.
+
+    All inputs and outputs are 1D arrays of the same length. The kernel gets
+    views of one block and has to write its result into the output views.
+    Scalar parameters are bound beforehand with functools.partial.
+    At most workers blocks run at the same time, workers=1 runs them
+    serially in the calling thread.
+    """
+    length = _common_length(inputs, outputs)
+    bounds = chunk_bounds(length, chunk_size)
+    workers = default_workers() if workers is None else workers
+
+    def run_blocks(blocks: List[Tuple[int, int]]) -> None:
+        for start, stop in blocks:
+            kernel(
+                *(array[start:stop] for array in inputs),
+                *(array[start:stop] for array in outputs),
+            )
+
+    # a single block is not worth the pool overhead
+    if len(bounds) <= 1 or workers <= 1:
+        run_blocks(bounds)
+        return
+
+    # one task per worker, each running every workers-th block
+    streams = min(workers, len(bounds))
+    # list() re-raises the first exception from a worker
+    list(_shared_pool().map(run_blocks, [bounds[i::streams] for i in range(streams)]))
+
+
+def process_map_chunks(
+    kernel: ChunkKernel,
+    inputs: Sequence[npt.NDArray],
+    outputs: Sequence[npt.NDArray],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int | None = None,
+) -> None:
+    """Same as map_chunks but on a process pool over shared memory.
+
+    Meant for kernels that do not release the GIL. The kernel has to be a
+    module level function, or a partial of one, so it can be pickled to the
+    worker processes. Inputs are copied into shared memory once and every
+    output is copied back once, the blocks themselves are not copied.
+    """
+    length = _common_length(inputs, outputs)
+    bounds = chunk_bounds(length, chunk_size)
+    workers = default_workers() if workers is None else workers
+
+    if len(bounds) <= 1 or workers <= 1:
+        map_chunks(kernel, inputs, outputs, chunk_size, workers=1)
+        return
+
+    segments = []
+    try:
+        input_specs = []
+        for array in inputs:
+            segment = _to_shared(array)
+            segments.append(segment)
+            input_specs.append((segment.name, array.dtype.str))
+        output_specs = []
+        for array in outputs:
+            segment = _to_shared(array, copy=False)
+            segments.append(segment)
+            output_specs.append((segment.name, array.dtype.str))
+
+        pool = _shared_process_pool()
+        streams = min(workers, len(bounds))
+        futures = [
+            pool.submit(
+                _run_shared_blocks,
+                kernel,
+                input_specs,
+                output_specs,
+                length,
+                bounds[i::streams],
+            )
+            for i in range(streams)
+        ]
+        for future in futures:
+            # re-raises the exception of a failed block
+            future.result()
+
+        for array, segment in zip(outputs, segments[len(inputs) :]):
+            array[...] = np.ndarray(length, dtype=array.dtype, buffer=segment.buf)
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+
+def _common_length(
+    inputs: Sequence[npt.NDArray], outputs: Sequence[npt.NDArray]
+) -> int:
+    """Check all arrays are 1D with one shared length and return it."""
+    arrays = [*inputs, *outputs]
+    if not arrays:
+        raise ValueError("at least one input or output array is required")
+    lengths = {np.shape(array) for array in arrays}
+    if len(lengths) != 1 or len(next(iter(lengths))) != 1:
+        raise ValueError("all arrays must be 1D and of the same length")
+    return len(arrays[0])
+
+
+def _to_shared(array: npt.NDArray, copy: bool = True) -> shared_memory.SharedMemory:
+    """New shared memory segment sized for array, optionally holding a copy of it."""
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    if copy:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    return segment
+
+
+def _run_shared_blocks(
+    kernel: ChunkKernel,
+    input_specs: List[Tuple[str, str]],
+    output_specs: List[Tuple[str, str]],
+    length: int,
+    blocks: List[Tuple[int, int]],
+) -> None:
+    """Attach to the shared segments and run kernel over the given blocks."""
+    specs = [*input_specs, *output_specs]
+    segments = [shared_memory.SharedMemory(name=name) for name, _ in specs]
+    views = []
+    try:
+        views = [
+            np.ndarray(length, dtype=dtype, buffer=segment.buf)
+            for segment, (_, dtype) in zip(segments, specs)
+        ]
+        try:
+            for start, stop in blocks:
+                kernel(*(view[start:stop] for view in views))
+        except Exception as error:
+            # the kernel frames in the traceback would keep the views alive
+            raise error.with_traceback(None)
+    finally:
+        # the views must be gone before the segments can be closed
+        views.clear()
+        for segment in segments:
+            segment.close()
+
+
+def _radec_to_cartesian_kernel(
+    origin: Tuple[float, float, float],
+    ra: npt.NDArray,
+    dec: npt.NDArray,
+    distance: npt.NDArray,
+    x: npt.NDArray,
+    y: npt.NDArray,
+    z: npt.NDArray,
+) -> None:
+    """Spherical (deg, deg, pc) to cartesian (pc) relative to origin for one block."""
+    ra_rad = np.radians(ra)
+    dec_rad = np.radians(dec)
+    # reuse the output buffers for intermediates to save allocations
+    np.cos(dec_rad, out=z)
+    np.multiply(z, distance, out=z)
+    np.multiply(z, np.cos(ra_rad), out=x)
+    np.multiply(z, np.sin(ra_rad), out=y)
+    np.sin(dec_rad, out=z)
+    np.multiply(z, distance, out=z)
+    x -= origin[0]
+    y -= origin[1]
+    z -= origin[2]
+
+
+def _parallax_to_distance_kernel(parallax: npt.NDArray, distance: npt.NDArray) -> None:
+    """Parallax (mas) to distance (pc) for one block."""
+    with np.errstate(divide="ignore"):
+        np.divide(1000.0, parallax, out=distance)
+    # no distance for a negative parallax, like Distance(allow_negative=True)
+    distance[distance < 0] = np.nan
+
+
+def _fov_half_width_kernel(
+    center: Tuple[float, float],
+    ra: npt.NDArray,
+    dec: npt.NDArray,
+    half_width: npt.NDArray,
+) -> None:
+    """Larger of the ra and dec offsets from the center for one block."""
+    np.subtract(ra, center[0], out=half_width)
+    np.abs(half_width, out=half_width)
+    # dec offset goes through a temporary of one block only
+    np.maximum(half_width, np.abs(dec - center[1]), out=half_width)
+
+
+def parallax_to_distance(
+    parallax: npt.ArrayLike, workers: int | None = None
+) -> npt.NDArray[np.float64]:
+    """Distance in parsec from parallax in milliarcseconds.
+
+    Matches astropy's Distance(parallax=..., allow_negative=True): a negative
+    parallax gives NaN and zero gives inf, without the warning.
+    """
+    parallax = np.ascontiguousarray(parallax, dtype=np.float64).ravel()
+    distance = np.empty_like(parallax)
+    map_chunks(_parallax_to_distance_kernel, [parallax], [distance], workers=workers)
+    return distance
+
+
+def radec_to_cartesian(
+    ra: npt.ArrayLike,
+    dec: npt.ArrayLike,
+    distance: npt.ArrayLike,
+    origin: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+    workers: int | None = None,
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Cartesian x, y, z in parsec from ra/dec in degrees and distance in parsec.
+
+    The origin is subtracted inside each block, so shifting the reference point
+    to an exoplanet costs no extra pass over the arrays.
+    """
+    ra = np.ascontiguousarray(ra, dtype=np.float64).ravel()
+    dec = np.ascontiguousarray(dec, dtype=np.float64).ravel()
+    distance = np.ascontiguousarray(
+        np.broadcast_to(np.asarray(distance, dtype=np.float64).ravel(), ra.shape)
+    )
+    x, y, z = np.empty_like(ra), np.empty_like(ra), np.empty_like(ra)
+    map_chunks(
+        partial(_radec_to_cartesian_kernel, origin),
+        [ra, dec, distance],
+        [x, y, z],
+        workers=workers,
+    )
+    return x, y, z
+
+
+def fov_half_width(
+    ra: npt.ArrayLike,
+    dec: npt.ArrayLike,
+    center_ra: float,
+    center_dec: float,
+    workers: int | None = None,
+) -> npt.NDArray[np.float64]:
+    """Half width of the smallest square FOV around the center holding each star.
+
+    A star is strictly inside a FOV of width fov when its value is below fov / 2.
+    Missing positions give NaN.
+    """
+    ra = np.ascontiguousarray(ra, dtype=np.float64).ravel()
+    dec = np.ascontiguousarray(dec, dtype=np.float64).ravel()
+    half_width = np.empty_like(ra)
+    map_chunks(
+        partial(_fov_half_width_kernel, (center_ra, center_dec)),
+        [ra, dec],
+        [half_width],
+        workers=workers,
+    )
+    return half_width
@@ -3,42 +3,43 @@
 This scirpt is suppose to be a cleaner backend version of messy_coordinate_transformation.ipynb.
 """
 
-import io
-from typing import Dict, TypedDict
+import os
+from typing import Callable, Dict, Tuple
 
 import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import PIL
 import plotly.graph_objects as go
 from astropy import units as u
-from astropy.coordinates import Distance, SkyCoord
+from astropy.coordinates import CartesianRepresentation, Distance, SkyCoord
 from astroquery.gaia import Gaia
 from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
 
-matplotlib.use("Agg")
-
-
-class SelectionPlanet(TypedDict):
-    """Allow the user to select planet."""
-
-    planet: str
-    checked_earth_pov: bool
-
-
-class CreateStarChart(TypedDict):
-    """Allow the user to view how stars can be displayed."""
-
-    star_size: int | float
-    magnitude_limit: int | float
-    fov: int | float
+from backend.chart_session import StarChartSession, StarIndex
+from backend.chart_types import CreateStarChart, SelectionPlanet, ThreeDStarChart
+from backend.chunked_execution import parallax_to_distance, radec_to_cartesian
+from backend.render_cache import RenderCache, render_cache_key
+from backend.star_table import StarTable
 
+matplotlib.use("Agg")
 
-class ThreeDStarChart(TypedDict):
-    """Allow the user to view 3D star chart."""
-
-    number_of_stars: int
+EXOPLANETS_FILE = r"resources\table_data\query_exoplanets.csv.gz"
+
+# star cones exported by query_stars_earth_pov and query_stars_exoplanet_pov
+PLANET_FILES = {
+    "TOI-700 d": (
+        r"resources\table_data\stars_from_earth_pov_radius90\query_stars_earth_to_toi-700d_cone.csv.gz",
+        r"resources\table_data\stars_from_exoplanet_pov_radius90\query_stars_from_toi-700d_cone.csv.gz",
+    ),
+    "Ross 128 b": (
+        r"resources\table_data\stars_from_earth_pov_radius90\query_stars_earth_to_ross-128b_cone.csv.gz",
+        r"resources\table_data\stars_from_exoplanet_pov_radius90\query_stars_from_ross-128b_cone.csv.gz",
+    ),
+    "TRAPPIST-1 e": (
+        r"resources\table_data\stars_from_earth_pov_radius90\query_stars_earth_to_trappist-1e_cone.csv.gz",
+        r"resources\table_data\stars_from_exoplanet_pov_radius90\query_stars_from_trappist-1e_cone.csv.gz",
+    ),
+}
 
 
 def query_exoplanets(export_path) -> pd.DataFrame:
@@ -59,9 +60,12 @@ def query_exoplanets(export_path) -> pd.DataFrame:
 
 def read_planet_data(
     select_exoplanet: SelectionPlanet,
-    exoplanets: str = r"resources\table_data\query_exoplanets.csv.gz",
+    exoplanets: str | None = None,
 ) -> Dict:
     """Get corresponding planet data from compressed query_exoplanets.csv."""
+    # looked up at call time, like dataset_version does
+    if exoplanets is None:
+        exoplanets = EXOPLANETS_FILE
     # reading the csv file is faster than querying the data again
     planet_path = pd.read_csv(exoplanets, compression="gzip")
     planet_data = planet_path[
@@ -170,99 +174,56 @@ def query_stars_exoplanet_pov(
     return df_results_stars_filtered
 
 
-def read_star_data(select_exoplanet: SelectionPlanet) -> Dict:
+def read_star_data(select_exoplanet: SelectionPlanet) -> Dict[str, StarTable]:
     """Read star data from the exported csv file."""
 
-    planet_files = {
-        "TOI-700 d": (
-            r"resources\table_data\stars_from_earth_pov_radius90\query_stars_earth_to_toi-700d_cone.csv.gz",
-            r"resources\table_data\stars_from_exoplanet_pov_radius90\query_stars_from_toi-700d_cone.csv.gz",
-        ),
-        "Ross 128 b": (
-            r"resources\table_data\stars_from_earth_pov_radius90\query_stars_earth_to_ross-128b_cone.csv.gz",
-            r"resources\table_data\stars_from_exoplanet_pov_radius90\query_stars_from_ross-128b_cone.csv.gz",
-        ),
-        "TRAPPIST-1 e": (
-            r"resources\table_data\stars_from_earth_pov_radius90\query_stars_earth_to_trappist-1e_cone.csv.gz",
-            r"resources\table_data\stars_from_exoplanet_pov_radius90\query_stars_from_trappist-1e_cone.csv.gz",
-        ),
-    }
-
-    query_stars_from_earth_cone, query_stars_from_planet_cone = planet_files.get(
+    query_stars_from_earth_cone, query_stars_from_planet_cone = PLANET_FILES.get(
         select_exoplanet["planet"], (None, None)
     )
 
-    from_earth_cone = pd.read_csv(query_stars_from_earth_cone, compression="gzip")
-    from_planet_cone = pd.read_csv(query_stars_from_planet_cone, compression="gzip")
-
     return {
-        "stars_from_earth_cone": from_earth_cone,
-        "earth_cone_ra": from_earth_cone["ra"],
-        "earth_cone_dec": from_earth_cone["dec"],
-        "earth_cone_parallax": from_earth_cone["parallax"],
-        "earth_cone_mag": from_earth_cone["phot_g_mean_mag"],
-        "earth_cone_gspphot": from_earth_cone["distance_gspphot"],
-        "stars_from_exo_cone": from_planet_cone,
-        "exo_cone_ra": from_planet_cone["ra"],
-        "exo_cone_dec": from_planet_cone["dec"],
-        "exo_cone_parallax": from_planet_cone["parallax"],
-        "exo_cone_mag": from_planet_cone["phot_g_mean_mag"],
-        "exo_cone_gspphot": from_planet_cone["distance_gspphot"],
+        "stars_from_earth_cone": StarTable.from_csv(query_stars_from_earth_cone),
+        "stars_from_exo_cone": StarTable.from_csv(query_stars_from_planet_cone),
     }
 
 
-def prepare_star_data(
-    select_exoplanet: SelectionPlanet,
-    star_chart: CreateStarChart,
-) -> Dict:
-    """Select the stars within the FOV of Earth to target Exoplanet.
+def dataset_version(select_exoplanet: SelectionPlanet) -> str:
+    """Version of the catalogs behind a planet, changes whenever a file is rewritten."""
+    files = (EXOPLANETS_FILE, *PLANET_FILES.get(select_exoplanet["planet"], ()))
+    stamps = []
+    for file in files:
+        stat = os.stat(file)
+        stamps.append(f"{file}:{stat.st_size}:{stat.st_mtime_ns}")
+    return ";".join(stamps)
 
-    Read the stars from query cone search from Gaia.
-    The exoplanet is at the center of Earth"s field of view.
-    Cone has a radius of 90 degrees.
-    """
-    exoplanet_ra = read_planet_data(select_exoplanet)["planet_ra"]
-    exoplanet_dec = read_planet_data(select_exoplanet)["planet_dec"]
-
-    star_data = read_star_data(select_exoplanet)
 
+def build_star_index(
+    select_exoplanet: SelectionPlanet, star_data: Dict[str, StarTable]
+) -> StarIndex:
+    """Sorted index of the cone shown for the selected point of view."""
+    planet_data = read_planet_data(select_exoplanet)
     if select_exoplanet["checked_earth_pov"]:
         stars = star_data["stars_from_earth_cone"]
-        star_ra = star_data["earth_cone_ra"]
-        star_dec = star_data["earth_cone_dec"]
     else:
         stars = star_data["stars_from_exo_cone"]
-        star_ra = star_data["exo_cone_ra"]
-        star_dec = star_data["exo_cone_dec"]
-
-    # view stars within a specific field of view
-    lower_ra = exoplanet_ra - star_chart["fov"] / 2
-    upper_ra = exoplanet_ra + star_chart["fov"] / 2
-    lower_dec = exoplanet_dec - star_chart["fov"] / 2
-    upper_dec = exoplanet_dec + star_chart["fov"] / 2
-
-    mask = (
-        (star_ra > lower_ra)
-        & (star_ra < upper_ra)
-        & (star_dec > lower_dec)
-        & (star_dec < upper_dec)
-    )
-    filtered_stars = stars[mask]
+    return StarIndex(stars, planet_data["planet_ra"], planet_data["planet_dec"])
 
-    return {
-        "stars_Earth_exo": filtered_stars,
-        "stars_upper_half": upper_ra,
-        "stars_lower_half": lower_ra,
-    }
 
+def galactic_to_cartesian(
+    ra, dec, parallax=None, distance=None
+) -> CartesianRepresentation:
+    """Convert galactic coordinates to Cartesian coordinates.
 
-def galactic_to_cartesian(ra, dec, parallax=None, distance=None) -> SkyCoord:
-    """Convert galactic coordinates to Cartesian coordinates."""
+    The conversion runs in chunks on all cores, see chunked_execution.
+    """
     if distance is None and parallax is not None:
-        distance = Distance(parallax=parallax.values * u.mas, allow_negative=True)
-    return SkyCoord(
-        ra=ra, dec=dec, distance=distance, unit=(u.deg, u.deg, u.pc)
-    ).represent_as("cartesian")
+        distance = parallax_to_distance(parallax)
+    x, y, z = radec_to_cartesian(ra, dec, distance)
+    # scalar input (a single planet) gives scalar output
+    shape = np.shape(ra)
+    return CartesianRepresentation(
+        x.reshape(shape), y.reshape(shape), z.reshape(shape), unit=u.pc
+    )
 
 
 def shift_coordinates(ras, decs, parallaxes, phi0, theta0, r0):
@@ -276,15 +237,22 @@ def shift_coordinates(ras, decs, parallaxes, phi0, theta0, r0):
     theta0 (float): Declination of the reference point.
     r0 (float): Parallax of the reference point.
     """
-    coord_exo_stars = galactic_to_cartesian(
-        ras, decs, parallax=parallaxes, distance=None
-    )
     coord_planets = galactic_to_cartesian(phi0, theta0, parallax=None, distance=r0)
-    x_new = coord_exo_stars.x - coord_planets.x
-    y_new = coord_exo_stars.y - coord_planets.y
-    z_new = coord_exo_stars.z - coord_planets.z
+    # the shift to the planet is applied inside the chunked transform
+    x_new, y_new, z_new = radec_to_cartesian(
+        ras,
+        decs,
+        parallax_to_distance(parallaxes),
+        origin=(
+            coord_planets.x.to_value(u.pc),
+            coord_planets.y.to_value(u.pc),
+            coord_planets.z.to_value(u.pc),
+        ),
+    )
 
-    coords_cartesian = SkyCoord(x_new, y_new, z_new, representation_type="cartesian")
+    coords_cartesian = SkyCoord(
+        x_new * u.pc, y_new * u.pc, z_new * u.pc, representation_type="cartesian"
+    )
     coords_spherical = coords_cartesian.represent_as("spherical")
 
     return coords_spherical, coords_cartesian
@@ -298,121 +266,140 @@ def calculate_distances_cartesian(x, y, z):
 class ExoSkyBackend:
     """Backend to display star charts."""
 
-    def __init__(self) -> None:
-        """Initialize the backend."""
+    def __init__(
+        self,
+        cache: RenderCache | None = None,
+        star_data: Callable[[SelectionPlanet], Dict[str, StarTable]] | None = None,
+        star_index: Callable[[SelectionPlanet], StarIndex] | None = None,
+    ) -> None:
+        """Initialize the backend.
+
+        Rendered charts are kept in cache, pass a RenderCache with a cache_dir
+        to also keep them on disk between sessions. star_data replaces
+        read_star_data, e.g. with catalogs already loaded in shared memory,
+        and star_index lets several backends share the sorted star indexes.
+        """
+        self.cache = cache if cache is not None else RenderCache()
+        self._read_star_data = star_data if star_data is not None else read_star_data
+        self._star_index = star_index if star_index is not None else self._build_index
+        # only the chart on screen keeps a session, each holds a full raster
+        self._session: StarChartSession | None = None
+        self._session_key: Tuple[str, bool] | None = None
+
+    def invalidate_cache(self) -> None:
+        """Forget rendered charts, call after the catalogs are refreshed."""
+        self.cache.invalidate()
+        self._drop_session()
 
     def create_star_chart(
         self,
         select_exoplanet: SelectionPlanet,
         star_chart: CreateStarChart,
     ):
-        """Star chart from Earth point of view.
-
-        The center of the chart is the target exoplanet.
+        """Star chart from Earth point of view, served from cache if rendered before."""
+        version = dataset_version(select_exoplanet)
+        key = render_cache_key("star_chart", select_exoplanet, star_chart, version)
+        nightsky = self.cache.get(key)
+        if nightsky is None:
+            nightsky = self._render_star_chart(select_exoplanet, star_chart, version)
+            self.cache.put(key, nightsky)
+        return nightsky
+
+    def star_chart_session(
+        self, select_exoplanet: SelectionPlanet, version: str | None = None
+    ) -> StarChartSession:
+        """Session of the selected planet and point of view.
+
+        Only the last used session is kept. It is rebuilt when the planet,
+        the point of view or the data changes.
         """
-        exo_name = read_planet_data(select_exoplanet)["exoplanet"]
-        exo_ra = read_planet_data(select_exoplanet)["planet_ra"]
-        exo_dec = read_planet_data(select_exoplanet)["planet_dec"]
-
-        star_data = prepare_star_data(select_exoplanet, star_chart)
-        stars_earth_exo = star_data["stars_Earth_exo"]
-        x_lim_lower = star_data["stars_lower_half"]
-        x_lim_upper = star_data["stars_upper_half"]
-
-        # filter stars based on input magnitude
-        brighter_stars = (
-            stars_earth_exo["phot_g_mean_mag"] <= star_chart["magnitude_limit"]
-        )
-        magnitude = stars_earth_exo["phot_g_mean_mag"][brighter_stars]
-
-        # adjust size of marker based on magnitude
-        marker_size = 10 ** (magnitude / -2.5) * star_chart["star_size"]
-
-        # plot stars
-        plt.figure(figsize=(8, 8), facecolor="#041A40")
-        plt.scatter(
-            stars_earth_exo["ra"][brighter_stars],
-            stars_earth_exo["dec"][brighter_stars],
-            s=marker_size,
-            color="white",
-            marker=".",
-            zorder=2,
-        )
-
-        if select_exoplanet["checked_earth_pov"]:
-            circle = plt.Circle(
-                (exo_ra, exo_dec),
-                radius=0.3,
-                color="red",
-                fill=False,
-                linewidth=2,
-                zorder=1,
-            )
-            plt.gca().add_patch(circle)
-            plt.text(
-                exo_ra + 0.5,
-                exo_dec,
-                exo_name,
-                color="yellow",
-                fontsize=10,
-                ha="left",
-                va="center",
+        if version is None:
+            version = dataset_version(select_exoplanet)
+        key = (select_exoplanet["planet"], bool(select_exoplanet["checked_earth_pov"]))
+        session = self._session
+        if (
+            session is None
+            or self._session_key != key
+            or session.dataset_version != version
+        ):
+            # free the previous raster before the next one is allocated
+            self._drop_session()
+            session = StarChartSession(
+                self._star_index(select_exoplanet),
+                read_planet_data(select_exoplanet)["exoplanet"],
+                select_exoplanet["checked_earth_pov"],
+                dataset_version=version,
             )
-            target_planet = "Earth"
-        else:
-            target_planet = exo_name
-
-        plt.gca().set_facecolor("black")
-        plt.gca().set_aspect("equal")
-        plt.xlim(x_lim_lower, x_lim_upper)
-        plt.margins(x=0, y=0)
-        plt.xticks(color="white")
-        plt.yticks(color="white")
-        plt.xlabel("Right Ascension", color="white")
-        plt.ylabel("Declination", color="white")
-        plt.title(
-            f"Star Chart from {target_planet} with fov of {star_chart["fov"]}",
-            color="yellow",
+            self._session = session
+            self._session_key = key
+        return session
+
+    def _build_index(self, select_exoplanet: SelectionPlanet) -> StarIndex:
+        """Sort the stars of the selected cone."""
+        return build_star_index(
+            select_exoplanet, self._read_star_data(select_exoplanet)
         )
 
-        # Convert plot to numpy array
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight", pad_inches=0.2, dpi=300)
-        buf.seek(0)
-        nightsky = PIL.Image.open(buf)
-        plt.close()
-        return np.array(nightsky)
+    def _drop_session(self) -> None:
+        """Close the current session."""
+        if self._session is not None:
+            self._session.close()
+        self._session = None
+        self._session_key = None
+
+    def _render_star_chart(
+        self,
+        select_exoplanet: SelectionPlanet,
+        star_chart: CreateStarChart,
+        version: str,
+    ):
+        """Star chart from Earth point of view.
+
+        The center of the chart is the target exoplanet. Only the stars that
+        entered or left the FOV/magnitude selection since the previous chart
+        of this planet are looked at.
+        """
+        session = self.star_chart_session(select_exoplanet, version)
+        session.update(star_chart["fov"], star_chart["magnitude_limit"])
+        return session.render(star_chart["star_size"])
 
     def create_threed_star_chart(
         self,
         select_exoplanet: SelectionPlanet,
         threed_star_chart: ThreeDStarChart,
+    ) -> str:
+        """Return 3D star chart as plotly JSON, served from cache if plotted before.
+
+        The JSON is what the GUI displays, caching it spares serializing the
+        figure again on every hit.
+        """
+        key = render_cache_key(
+            "threed_star_chart",
+            select_exoplanet,
+            threed_star_chart,
+            dataset_version(select_exoplanet),
+        )
+        fig_json = self.cache.get(key)
+        if fig_json is None:
+            fig = self._render_threed_star_chart(select_exoplanet, threed_star_chart)
+            fig_json = fig.to_json()
+            self.cache.put(key, fig_json)
+        return fig_json
+
+    def _render_threed_star_chart(
+        self,
+        select_exoplanet: SelectionPlanet,
+        threed_star_chart: ThreeDStarChart,
     ) -> go.Figure:
         """Plot and return 3D star chart."""
-        exo_cone_ra = read_star_data(select_exoplanet)["exo_cone_ra"]
-        exo_cone_dec = read_star_data(select_exoplanet)["exo_cone_dec"]
-        exo_cone_parallax = read_star_data(select_exoplanet)["exo_cone_parallax"]
-        exo_cone_gspphot = read_star_data(select_exoplanet)["exo_cone_gspphot"]
-        exo_cone_mag = read_star_data(select_exoplanet)["exo_cone_mag"]
-
-        # Combine them into a DataFrame
-        df = pd.DataFrame(
-            {
-                "ra": exo_cone_ra,
-                "dec": exo_cone_dec,
-                "parallax": exo_cone_parallax,
-                "gspphot": exo_cone_gspphot,
-                "mag": exo_cone_mag,
-            }
-        )
-        # Drop rows where the value is missing
-        df_cleaned = df.dropna()
-        # Extract the filtered values back as individual Series
-        exo_cone_ra = df_cleaned["ra"]
-        exo_cone_dec = df_cleaned["dec"]
-        exo_cone_parallax = df_cleaned["parallax"]
-        exo_cone_gspphot = df_cleaned["gspphot"]
-        exo_cone_mag = df_cleaned["mag"]
+        # Drop stars where a value is missing
+        exo_cone = self._read_star_data(select_exoplanet)["stars_from_exo_cone"]
+        exo_cone = exo_cone.dropna()
+        exo_cone_ra = exo_cone.ra
+        exo_cone_dec = exo_cone.dec
+        exo_cone_parallax = exo_cone.parallax
+        exo_cone_gspphot = exo_cone.gspphot
+        exo_cone_mag = exo_cone.mag
 
         planet_ra = read_planet_data(select_exoplanet)["planet_ra"]
         planet_dec = read_planet_data(select_exoplanet)["planet_dec"]
@@ -436,7 +423,7 @@ class ExoSkyBackend:
             )
             # calculate absolute magnitude
             abs_magnitude = exo_cone_mag - 5 * np.log(
-                (Distance(parallax=exo_cone_parallax.values * u.mas) - 1 * u.pc).value
+                (Distance(parallax=exo_cone_parallax * u.mas) - 1 * u.pc).value
             )
             # recalculate apparent magnitude
             stars_abs_magnitude = abs_magnitude + 5 * np.log(np.abs(gspphot.value - 1))
@@ -468,9 +455,9 @@ class ExoSkyBackend:
                     y=[0],
                     z=[0],
                     mode="markers+text",
-                    name=f"{select_exoplanet["planet"]}",
+                    name=select_exoplanet["planet"],
                     marker=dict(size=5, color="red"),
-                    text=f"{select_exoplanet["planet"]}",
+                    text=select_exoplanet["planet"],
                     textposition="top center",
                 )
             )
@@ -533,7 +520,7 @@ class ExoSkyBackend:
                     y=[planets_coords.y.value],
                     z=[planets_coords.z.value],
                     mode="markers+text",
-                    name=f"{select_exoplanet["planet"]}",
+                    name=select_exoplanet["planet"],
                     marker=dict(size=5, color="red"),
                     text=[select_exoplanet["planet"]],
                     textposition="top center",
@@ -585,8 +572,7 @@ if __name__ == "__main__":
         # all stars from list can only be displayed in backend,
         # QML cannot display all
     )
-    # ra = read_star_data(data)["earth_cone_ra"]
-    # star_test = prepare_star_data(data, star_infos)
+    # ra = read_star_data(data)["stars_from_earth_cone"].ra
     # image = ExoSkyBackend().star_chart_from_earth(data, star_infos)
     ExoSkyBackend().create_threed_star_chart(data, threed_star_infos)
     print("Done!")
@@ -0,0 +1,228 @@
+"""Result cache for rendered star charts.
+
+Finished star chart images and 3D charts, as plotly JSON, are kept in an in-memory LRU and,
+optionally, in an on-disk store, so selecting the same planet and chart
+settings again does not rerun the whole pipeline. Several processes may share
+one cache_dir, so a disk entry can vanish at any time and then counts as a miss.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Mapping, Tuple
+
+import numpy as np
+
+# every GUI process has its own cache, 2D images at dpi=300 are ~23 MB each,
+# so this keeps the last few views
+DEFAULT_MEMORY_BUDGET = 128 * 1024**2
+DEFAULT_DISK_BUDGET = 2 * 1024**3
+
+# 3D charts are cached as the plotly JSON the GUI displays, so a hit does
+# not serialize the figure again
+RenderResult = np.ndarray | str
+
+
+def _canonical(value: Any) -> Any:
+    """Make equal parameters from QML and Python serialize the same way."""
+    if isinstance(value, Mapping):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.number)):
+        # QML hands numbers over as floats, 30 and 30.0 is the same chart
+        return float(value)
+    return str(value)
+
+
+def render_cache_key(
+    kind: str,
+    select_exoplanet: Mapping[str, Any],
+    chart: Mapping[str, Any],
+    dataset_version: str,
+) -> str:
+    """Hash of everything a rendered chart depends on."""
+    payload = json.dumps(
+        {
+            "kind": kind,
+            "planet": _canonical(select_exoplanet),
+            "chart": _canonical(chart),
+            "dataset_version": dataset_version,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _payload_nbytes(result: RenderResult) -> int:
+    """Memory held by a cached result, plotly JSON is ASCII."""
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    return len(result)
+
+
+class RenderCache:
+    """Two-level cache for star chart images and 3D chart JSON.
+
+    The first level is an in-memory LRU limited by memory_budget bytes. If
+    cache_dir is given, results are also written there and evicted oldest
+    first once disk_budget bytes are exceeded. Cached results are shared
+    between callers, images are returned read-only.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        cache_dir: str | Path | None = None,
+        disk_budget: int = DEFAULT_DISK_BUDGET,
+    ) -> None:
+        """Initialize the cache."""
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, Tuple[RenderResult, int]] = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of results held in memory."""
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        """Check if a result is cached in memory or on disk."""
+        with self._lock:
+            return key in self._entries or self._disk_path(key) is not None
+
+    def get(self, key: str) -> RenderResult | None:
+        """Return a cached result or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+            result = self._read_disk(key)
+            if result is not None:
+                self._store_memory(key, result, _payload_nbytes(result))
+            return result
+
+    def put(self, key: str, result: RenderResult) -> None:
+        """Cache a finished result."""
+        if isinstance(result, np.ndarray):
+            # shared by every caller from now on
+            result.flags.writeable = False
+        with self._lock:
+            self._store_memory(key, result, _payload_nbytes(result))
+            self._write_disk(key, result)
+
+    def invalidate(self) -> None:
+        """Drop every cached result, e.g. after the catalogs are refreshed."""
+        with self._lock:
+            self._entries.clear()
+            self._memory_used = 0
+            if self.cache_dir is not None:
+                for path in self._disk_files():
+                    path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Current number of entries and bytes used."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_used,
+                "disk_bytes": sum(size for _, size, _ in self._disk_entries()),
+            }
+
+    def _store_memory(self, key: str, result: RenderResult, nbytes: int) -> None:
+        """Insert into the LRU and evict the least recently used results."""
+        if isinstance(result, np.ndarray):
+            result.flags.writeable = False
+        if key in self._entries:
+            self._memory_used -= self._entries.pop(key)[1]
+        if nbytes > self.memory_budget:
+            # larger than the whole budget, keep it on disk only
+            return
+        self._entries[key] = (result, nbytes)
+        self._memory_used += nbytes
+        while self._memory_used > self.memory_budget:
+            _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+            self._memory_used -= evicted_nbytes
+
+    def _disk_files(self) -> list[Path]:
+        """Files of the on-disk store."""
+        if self.cache_dir is None:
+            return []
+        return [
+            path
+            for path in self.cache_dir.iterdir()
+            if path.suffix in (".npy", ".json")
+        ]
+
+    def _disk_entries(self) -> list[Tuple[float, int, Path]]:
+        """Modification time, size and path of every file of the on-disk store."""
+        entries = []
+        for path in self._disk_files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # evicted by another process sharing the directory
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _disk_path(self, key: str) -> Path | None:
+        """Path of a stored result or None."""
+        if self.cache_dir is None:
+            return None
+        for suffix in (".npy", ".json"):
+            path = self.cache_dir / f"{key}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def _read_disk(self, key: str) -> RenderResult | None:
+        """Load a result from the on-disk store."""
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            # reads refresh the mtime, so disk eviction drops the least recently
+            # used, unlike touch it does not recreate a file evicted meanwhile
+            os.utime(path)
+            if path.suffix == ".npy":
+                return np.load(path, allow_pickle=False)
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, result: RenderResult) -> None:
+        """Write a result to the on-disk store and enforce the disk budget."""
+        if self.cache_dir is None:
+            return
+        suffix = ".npy" if isinstance(result, np.ndarray) else ".json"
+        path = self.cache_dir / f"{key}{suffix}"
+        # a temporary file of its own, other processes may write the same key
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".tmp", delete=False
+        ) as file:
+            if isinstance(result, np.ndarray):
+                np.save(file, result, allow_pickle=False)
+            else:
+                file.write(result.encode("utf-8"))
+        # write then rename so a crash never leaves a half written entry
+        Path(file.name).replace(path)
+
+        entries = sorted(self._disk_entries())
+        disk_used = sum(size for _, size, _ in entries)
+        for _, size, file in entries:
+            if disk_used <= self.disk_budget:
+                break
+            disk_used -= size
+            file.unlink(missing_ok=True)
@@ -0,0 +1,140 @@
+"""Compact column store for star cones.
+
+Pandas is only used to parse the exported csv files. After that the stars
+travel through the backend as one contiguous NumPy array per column, which is
+what the chunked kernels in chunked_execution work on.
+"""
+
+from typing import Dict, Iterator, Mapping
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+# Gaia columns used by the backend, the designation is never displayed
+STAR_DTYPES: Dict[str, np.dtype] = {
+    "ra": np.dtype(np.float64),
+    "dec": np.dtype(np.float64),
+    "parallax": np.dtype(np.float64),
+    "phot_g_mean_mag": np.dtype(np.float64),
+    "distance_gspphot": np.dtype(np.float64),
+}
+
+
+class StarTable:
+    """Stars of one cone as parallel column arrays with fixed dtypes.
+
+    Indexing with a column name returns that column. Indexing with a slice
+    returns a table of views, with a boolean mask or index array a table of
+    the selected rows.
+    """
+
+    __slots__ = ("_columns", "_length")
+
+    def __init__(self, columns: Mapping[str, npt.ArrayLike]) -> None:
+        """Initialize the table from a column name to values mapping."""
+        missing = set(STAR_DTYPES) - set(columns)
+        if missing:
+            raise ValueError(f"missing star columns: {sorted(missing)}")
+        self._columns: Dict[str, npt.NDArray] = {
+            name: np.ascontiguousarray(columns[name], dtype=dtype)
+            for name, dtype in STAR_DTYPES.items()
+        }
+        lengths = {len(column) for column in self._columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("all star columns must have the same length")
+        self._length = lengths.pop()
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "StarTable":
+        """Take the star columns out of a DataFrame."""
+        return cls(
+            {
+                name: df[name].to_numpy(dtype=dtype)
+                for name, dtype in STAR_DTYPES.items()
+            }
+        )
+
+    @classmethod
+    def from_csv(cls, path: str) -> "StarTable":
+        """Read the star columns of a compressed csv exported from Gaia."""
+        df = pd.read_csv(
+            path, compression="gzip", usecols=list(STAR_DTYPES), dtype=STAR_DTYPES
+        )
+        return cls.from_dataframe(df)
+
+    def __len__(self) -> int:
+        """Number of stars."""
+        return self._length
+
+    def __iter__(self) -> Iterator[str]:
+        """Column names."""
+        return iter(self._columns)
+
+    def __getitem__(self, key):
+        """Column by name, or rows by slice, boolean mask or index array."""
+        if isinstance(key, str):
+            return self._columns[key]
+        return StarTable._from_arrays(
+            {name: column[key] for name, column in self._columns.items()}
+        )
+
+    @classmethod
+    def _from_arrays(cls, columns: Dict[str, npt.NDArray]) -> "StarTable":
+        """Wrap already typed columns without checking or copying them."""
+        table = cls.__new__(cls)
+        table._columns = columns
+        table._length = len(next(iter(columns.values())))
+        return table
+
+    @property
+    def ra(self) -> npt.NDArray[np.float64]:
+        """Right ascension in degrees."""
+        return self._columns["ra"]
+
+    @property
+    def dec(self) -> npt.NDArray[np.float64]:
+        """Declination in degrees."""
+        return self._columns["dec"]
+
+    @property
+    def parallax(self) -> npt.NDArray[np.float64]:
+        """Parallax in milliarcseconds."""
+        return self._columns["parallax"]
+
+    @property
+    def mag(self) -> npt.NDArray[np.float64]:
+        """Gaia G band mean magnitude."""
+        return self._columns["phot_g_mean_mag"]
+
+    @property
+    def gspphot(self) -> npt.NDArray[np.float64]:
+        """Distance from GSP-Phot in parsec."""
+        return self._columns["distance_gspphot"]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the columns."""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def head(self, number_of_stars: int) -> "StarTable":
+        """First stars of the table as views."""
+        return self[:number_of_stars]
+
+    def notna(self) -> npt.NDArray[np.bool_]:
+        """Mask of stars without any missing value."""
+        mask = np.ones(self._length, dtype=np.bool_)
+        for column in self._columns.values():
+            mask &= ~np.isnan(column)
+        return mask
+
+    def dropna(self) -> "StarTable":
+        """Stars without any missing value, the table itself if none is missing."""
+        mask = self.notna()
+        if mask.all():
+            return self
+        return self[mask]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Columns as a DataFrame, for export and debugging."""
+        return pd.DataFrame(self._columns)
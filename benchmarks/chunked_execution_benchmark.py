@@ -0,0 +1,110 @@
+"""Compare the chunked kernels with the plain NumPy path.
+
+Run from the repository root with
+
+    python -m benchmarks.chunked_execution_benchmark [number_of_stars]
+
+It prints the time of every worker count from 1 up to the number of cores,
+with the speed-up over one worker and the parallel efficiency (speed-up per
+worker, 100 % is linear scaling), and the process pool for comparison.
+"""
+
+import sys
+import time
+from functools import partial
+
+import numpy as np
+
+from backend import chunked_execution
+from backend.chunked_execution import (
+    default_workers,
+    process_map_chunks,
+    radec_to_cartesian,
+)
+
+
+def numpy_radec_to_cartesian(ra, dec, distance):
+    """Reference transform without chunks."""
+    ra = np.radians(ra)
+    dec = np.radians(dec)
+    return (
+        distance * np.cos(dec) * np.cos(ra),
+        distance * np.cos(dec) * np.sin(ra),
+        distance * np.sin(dec),
+    )
+
+
+def best_of(function, repeat=5):
+    """Fastest of several runs in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def worker_counts() -> list[int]:
+    """Powers of two up to the number of cores, and the number of cores."""
+    counts = [1]
+    while counts[-1] * 2 <= default_workers():
+        counts.append(counts[-1] * 2)
+    if counts[-1] != default_workers():
+        counts.append(default_workers())
+    return counts
+
+
+def process_radec_to_cartesian(ra, dec, distance):
+    """Same transform on the process pool over shared memory."""
+    x, y, z = np.empty_like(ra), np.empty_like(ra), np.empty_like(ra)
+    process_map_chunks(
+        partial(
+            chunked_execution._radec_to_cartesian_kernel,  # pylint: disable=protected-access
+            (0.0, 0.0, 0.0),
+        ),
+        [ra, dec, distance],
+        [x, y, z],
+        workers=max(default_workers(), 2),
+    )
+    return x, y, z
+
+
+def main() -> None:
+    """Benchmark entry point."""
+    number_of_stars = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    rng = np.random.default_rng(0)
+    ra = rng.uniform(0, 360, number_of_stars)
+    dec = rng.uniform(-90, 90, number_of_stars)
+    distance = rng.uniform(1, 1000, number_of_stars)
+
+    expected = numpy_radec_to_cartesian(ra, dec, distance)
+    for actual, reference in zip(radec_to_cartesian(ra, dec, distance), expected):
+        np.testing.assert_allclose(actual, reference)
+
+    for actual, reference in zip(
+        process_radec_to_cartesian(ra, dec, distance), expected
+    ):
+        np.testing.assert_allclose(actual, reference)
+
+    numpy_time = best_of(lambda: numpy_radec_to_cartesian(ra, dec, distance))
+    print(f"{number_of_stars} stars, {default_workers()} cores")
+    print(f"plain numpy          {numpy_time * 1000:8.1f} ms")
+    serial_time = None
+    for workers in worker_counts():
+        threaded_time = best_of(
+            lambda workers=workers: radec_to_cartesian(
+                ra, dec, distance, workers=workers
+            )
+        )
+        serial_time = serial_time or threaded_time
+        speed_up = serial_time / threaded_time
+        print(
+            f"{workers:3d} threads          {threaded_time * 1000:8.1f} ms"
+            f"  {speed_up:5.1f}x  {speed_up / workers:6.1%} efficiency"
+        )
+    process_time = best_of(lambda: process_radec_to_cartesian(ra, dec, distance))
+    print(f"process pool         {process_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Shared fixtures of the backend tests."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import exosky_backend
+
+
+def write_cone_file(path, seed: int) -> None:
+    """Small gzip cone around the planet."""
+    rng = np.random.default_rng(seed)
+    number_of_stars = 200
+    pd.DataFrame(
+        {
+            "ra": rng.uniform(0, 90, number_of_stars),
+            "dec": rng.uniform(-45, 45, number_of_stars),
+            "parallax": rng.uniform(1, 5, number_of_stars),
+            "phot_g_mean_mag": rng.uniform(0, 10, number_of_stars),
+            "distance_gspphot": rng.uniform(1, 100, number_of_stars),
+        }
+    ).to_csv(path, index=False, compression="gzip")
+
+
+@pytest.fixture(name="write_cone")
+def fixture_write_cone():
+    """Write a small gzip cone, seeded so rewrites change the stars."""
+    return write_cone_file
+
+
+@pytest.fixture(name="catalogs")
+def fixture_catalogs(tmp_path, monkeypatch):
+    """Point the backend at catalogs of one planet P in tmp_path."""
+    exoplanets = tmp_path / "exoplanets.csv.gz"
+    pd.DataFrame(
+        {
+            "pl_name": ["P"],
+            "ra": [45.0],
+            "dec": [0.0],
+            "sy_plx": [50.0],
+            "sy_dist": [20.0],
+        }
+    ).to_csv(exoplanets, index=False, compression="gzip")
+    earth_cone = tmp_path / "earth_cone.csv.gz"
+    exo_cone = tmp_path / "exo_cone.csv.gz"
+    write_cone_file(earth_cone, 0)
+    write_cone_file(exo_cone, 1)
+    monkeypatch.setattr(exosky_backend, "EXOPLANETS_FILE", str(exoplanets))
+    monkeypatch.setattr(
+        exosky_backend, "PLANET_FILES", {"P": (str(earth_cone), str(exo_cone))}
+    )
+    return {"earth_cone": earth_cone, "exo_cone": exo_cone}
@@ -0,0 +1,78 @@
+"""Tests for the backend client losing its server."""
+
+import sys
+import threading
+from multiprocessing.connection import Listener
+
+import pytest
+
+from backend import exosky_backend
+from backend.backend_client import BackendClient
+from backend.backend_protocol import (
+    ENCODING_IDENTITY,
+    KIND_THREED_STAR_CHART,
+    STATUS_OK,
+    ResponseHeader,
+    encode_response_header,
+)
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="unix socket files")
+
+SELECT = {"planet": "P", "checked_earth_pov": False}
+THREED = {"number_of_stars": 10}
+
+
+def serve(listener, answer_second: bool) -> threading.Thread:
+    """Drop the first client connection, then answer once or shut down."""
+
+    def run():
+        with listener.accept():
+            if not answer_second:
+                listener.close()
+                return
+        with listener.accept() as connection:
+            connection.recv_bytes()
+            header = ResponseHeader(
+                STATUS_OK, KIND_THREED_STAR_CHART, ENCODING_IDENTITY, 0, 0, 0, 2
+            )
+            connection.send_bytes(encode_response_header(header))
+            connection.send_bytes(b"{}")
+        listener.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_reconnects_after_broken_connection(tmp_path):
+    """A restarted connection answers the request that failed."""
+    listener = Listener(str(tmp_path / "backend.sock"))
+    thread = serve(listener, answer_second=True)
+    client = BackendClient(listener.address)
+
+    assert client.create_threed_star_chart(SELECT, THREED) == "{}"
+    assert not client.is_local
+    thread.join(5)
+    client.close()
+
+
+def test_falls_back_to_local_backend(tmp_path, monkeypatch):
+    """Once the server is gone charts are rendered in the client process."""
+
+    class LocalBackend:  # pylint: disable=too-few-public-methods
+        """Stands in for ExoSkyBackend."""
+
+        def create_threed_star_chart(self, select_exoplanet, threed_star_chart):
+            """Local 3D chart."""
+            return "local"
+
+    monkeypatch.setattr(exosky_backend, "ExoSkyBackend", LocalBackend)
+    listener = Listener(str(tmp_path / "backend.sock"))
+    thread = serve(listener, answer_second=False)
+    client = BackendClient(listener.address)
+
+    assert client.create_threed_star_chart(SELECT, THREED) == "local"
+    assert client.is_local
+    assert client.create_threed_star_chart(SELECT, THREED) == "local"
+    thread.join(5)
+    client.close()
@@ -0,0 +1,49 @@
+"""Tests for the backend server protocol."""
+
+import numpy as np
+import pytest
+
+from backend.backend_protocol import (
+    ENCODING_IDENTITY,
+    KIND_STAR_CHART,
+    STATUS_OK,
+    ChartRequest,
+    ResponseHeader,
+    compress_payload,
+    decode_request,
+    decode_response_header,
+    decompress_payload,
+    encode_request,
+    encode_response_header,
+)
+
+
+def test_request_round_trip():
+    """A request survives encoding, including a non-ascii planet name."""
+    request = ChartRequest(KIND_STAR_CHART, "Ross 128 b ✦", True, 100.0, 8.5, 30.0, 0)
+    assert decode_request(encode_request(request)) == request
+
+
+def test_decode_request_rejects_other_version():
+    """Clients of another protocol version get an error, not a wrong chart."""
+    message = bytearray(encode_request(ChartRequest(1, "P", False, 1, 1, 1, 0)))
+    message[0] += 1
+    with pytest.raises(ValueError, match="protocol version"):
+        decode_request(bytes(message))
+
+
+def test_response_header_round_trip():
+    """The header carries the payload encoding."""
+    header = ResponseHeader(STATUS_OK, KIND_STAR_CHART, 1, 2400, 2400, 4, 123)
+    assert decode_response_header(encode_response_header(header)) == header
+
+
+def test_compressed_image_payload_round_trip():
+    """A mostly empty chart shrinks and decodes to the same pixels."""
+    image = np.zeros((200, 200, 4), dtype=np.uint8)
+    image[50:60, 70:80] = 255
+    encoding, payload = compress_payload(image.reshape(-1).data)
+    assert len(payload) < image.nbytes // 10
+    decoded = np.frombuffer(decompress_payload(encoding, payload), dtype=np.uint8)
+    np.testing.assert_array_equal(decoded.reshape(image.shape), image)
+    assert decompress_payload(ENCODING_IDENTITY, b"error") == b"error"
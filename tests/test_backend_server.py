@@ -0,0 +1,195 @@
+"""Tests for the star catalogs the backend server keeps in shared memory."""
+
+import gc
+import json
+import socket
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Listener
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backend import backend_server, exosky_backend
+from backend.backend_client import BackendClient
+from backend.backend_protocol import BackendServerError
+from backend.backend_server import BackendServer, SharedStarCatalog, attach_star_table
+from backend.exosky_backend import ExoSkyBackend
+from backend.star_table import StarTable
+
+PLANET = {"planet": "P", "checked_earth_pov": False}
+EARTH = {"planet": "P", "checked_earth_pov": True}
+
+
+def make_cones(value: float):
+    """Both cones of one planet, filled with value."""
+    columns = {
+        name: np.full(10, value)
+        for name in ("ra", "dec", "parallax", "phot_g_mean_mag", "distance_gspphot")
+    }
+    return {
+        "stars_from_earth_cone": StarTable(columns),
+        "stars_from_exo_cone": StarTable(columns),
+    }
+
+
+@pytest.fixture(name="catalog")
+def fixture_catalog(monkeypatch):
+    """Catalog over in-memory cones, the version is switched by the test."""
+    versions = {"current": "1"}
+    monkeypatch.setattr(
+        backend_server,
+        "read_star_data",
+        lambda select_exoplanet: make_cones(float(versions["current"])),
+    )
+    monkeypatch.setattr(
+        backend_server, "dataset_version", lambda select_exoplanet: versions["current"]
+    )
+    catalog = SharedStarCatalog()
+    catalog.versions = versions
+    yield catalog
+    catalog.close()
+
+
+def segment_exists(segment_names, length=10) -> bool:
+    """Attach to the segments to see whether they were removed."""
+    try:
+        _, segments = attach_star_table(segment_names, length)
+    except FileNotFoundError:
+        return False
+    for segment in segments:
+        segment.close()
+    return True
+
+
+def test_attaching_process_keeps_segments(catalog):
+    """Another process can read the cones and exit without removing them."""
+    stars = catalog.star_data(PLANET)["stars_from_exo_cone"]
+    cone = catalog.manifest()["P"]["stars_from_exo_cone"]
+    script = (
+        "import sys; from backend.backend_server import attach_star_table;"
+        f"table, _ = attach_star_table({cone['segments']!r}, {cone['length']});"
+        "print(table.ra.sum())"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).resolve().parents[1],
+    )
+    # astroquery may print a status line on import
+    assert float(result.stdout.split()[-1]) == stars.ra.sum()
+    assert segment_exists(cone["segments"])
+
+
+def test_replaced_segments_removed_once_unused(catalog):
+    """Old cones stay while a session uses them and go right after."""
+    in_use = catalog.star_data(PLANET)["stars_from_exo_cone"].head(5)
+    old = catalog.manifest()["P"]
+    catalog.versions["current"] = "2"
+    assert catalog.star_data(PLANET)["stars_from_exo_cone"].ra[0] == 2.0
+
+    assert segment_exists(old["stars_from_exo_cone"]["segments"])
+    assert not segment_exists(old["stars_from_earth_cone"]["segments"])
+    assert in_use.ra[0] == 1.0
+    del in_use
+    gc.collect()
+    assert not segment_exists(old["stars_from_exo_cone"]["segments"])
+
+
+def test_close_removes_current_segments(catalog):
+    """Nothing is left behind after close."""
+    catalog.star_data(PLANET)
+    cone = catalog.manifest()["P"]["stars_from_earth_cone"]
+    catalog.close()
+    assert not segment_exists(cone["segments"])
+
+
+def test_clients_share_one_index_per_cone(catalog, monkeypatch):
+    """Connecting clients add a selection mask each, the indexes are built once."""
+    monkeypatch.setattr(
+        exosky_backend, "dataset_version", lambda select: catalog.versions["current"]
+    )
+    monkeypatch.setattr(
+        exosky_backend,
+        "read_planet_data",
+        lambda select: {"exoplanet": "P", "planet_ra": 1.0, "planet_dec": 1.0},
+    )
+    built = []
+    build = backend_server.build_star_index
+    monkeypatch.setattr(
+        backend_server,
+        "build_star_index",
+        lambda *args: built.append(args) or build(*args),
+    )
+    server = BackendServer()
+    server.catalog = catalog
+
+    clients = []
+    for _ in range(4):
+        clients.append(server._client_backend())  # pylint: disable=protected-access
+        clients[-1].star_chart_session(EARTH)
+        exo = clients[-1].star_chart_session(PLANET)
+        # switching cones dropped the earth session, one session per client
+        assert clients[-1]._session is exo  # pylint: disable=protected-access
+        assert len(built) == 2
+    sessions = [client.star_chart_session(PLANET) for client in clients]
+    index = sessions[0].index
+    assert all(session.index is index for session in sessions)
+    assert not index.fov_order.flags.writeable
+
+    catalog.versions["current"] = "2"
+    assert server._client_backend().star_chart_session(PLANET).index is not index
+    assert len(built) == 3
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="unix socket files")
+def test_claim_address_keeps_running_server(tmp_path):
+    """A stale socket is replaced, a live one is left to its server."""
+    address = str(tmp_path / "backend.sock")
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(address)
+    stale.close()
+    BackendServer(address)._claim_address()  # pylint: disable=protected-access
+
+    with Listener(address):
+        with pytest.raises(RuntimeError, match="another backend server"):
+            BackendServer(address)._claim_address()  # pylint: disable=protected-access
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="unix socket files")
+def test_client_round_trip(catalogs, tmp_path):  # pylint: disable=unused-argument
+    """Charts from the server match local ones, errors keep the connection open."""
+    star_chart = {"star_size": 100, "magnitude_limit": 8, "fov": 30}
+    threed = {"number_of_stars": 50}
+    server = BackendServer(authkey=b"test")
+    listener = Listener(str(tmp_path / "backend.sock"), authkey=b"test")
+    thread = threading.Thread(
+        target=lambda: server._serve_client(  # pylint: disable=protected-access
+            listener.accept()
+        ),
+        daemon=True,
+    )
+    thread.start()
+    client = BackendClient(listener.address, authkey=b"test")
+    local = ExoSkyBackend()
+    try:
+        image = client.create_star_chart(EARTH, star_chart)
+        assert np.array_equal(image, local.create_star_chart(EARTH, star_chart))
+
+        with pytest.raises(BackendServerError):
+            client.create_star_chart({**EARTH, "planet": "unknown"}, star_chart)
+
+        fig_json = client.create_threed_star_chart(PLANET, threed)
+        assert json.loads(fig_json) == json.loads(
+            local.create_threed_star_chart(PLANET, threed)
+        )
+        assert not client.is_local
+    finally:
+        client.close()
+        thread.join(5)
+        listener.close()
+        server.catalog.close()
@@ -0,0 +1,112 @@
+"""Tests for the incremental star chart session."""
+
+import numpy as np
+import pytest
+
+from backend.chart_session import StarChartSession, StarIndex
+from backend.star_table import StarTable
+
+PLANET_RA = 45.0
+PLANET_DEC = 0.0
+
+
+def make_stars(number_of_stars: int, seed: int = 0) -> StarTable:
+    """Random cone around the planet with a few missing values."""
+    rng = np.random.default_rng(seed)
+    ra = rng.uniform(0, 90, number_of_stars)
+    dec = rng.uniform(-45, 45, number_of_stars)
+    # coarse magnitudes, so limits often land exactly on a star
+    mag = np.round(rng.uniform(0, 10, number_of_stars), 1)
+    ra[::997] = np.nan
+    mag[::1009] = np.nan
+    return StarTable(
+        {
+            "ra": ra,
+            "dec": dec,
+            "parallax": rng.uniform(1, 5, number_of_stars),
+            "phot_g_mean_mag": mag,
+            "distance_gspphot": rng.uniform(1, 100, number_of_stars),
+        }
+    )
+
+
+def brute_force(stars: StarTable, fov: float, magnitude_limit: float):
+    """Selection of the baseline filter, computed from scratch."""
+    mask = (
+        (stars.ra > PLANET_RA - fov / 2)
+        & (stars.ra < PLANET_RA + fov / 2)
+        & (stars.dec > PLANET_DEC - fov / 2)
+        & (stars.dec < PLANET_DEC + fov / 2)
+        & (stars.mag <= magnitude_limit)
+    )
+    return np.flatnonzero(mask)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_selection_matches_brute_force_over_random_updates(seed):
+    """Every incremental update gives the same stars as a full filter."""
+    stars = make_stars(20_000, seed)
+    session = StarChartSession(
+        StarIndex(stars, PLANET_RA, PLANET_DEC), "P", True, dpi=10
+    )
+    rng = np.random.default_rng(seed + 100)
+    finite_mag = stars.mag[~np.isnan(stars.mag)]
+
+    for _ in range(100):
+        fov = float(rng.choice([rng.uniform(1, 90), session.fov or 30.0]))
+        if rng.random() < 0.5:
+            magnitude_limit = float(rng.choice(finite_mag))
+        else:
+            magnitude_limit = float(rng.uniform(-1, 11))
+        previous = set(session.selected.tolist())
+
+        delta = session.update(fov, magnitude_limit)
+
+        expected = brute_force(stars, fov, magnitude_limit)
+        np.testing.assert_array_equal(session.selected, expected)
+        assert set(delta.entering.tolist()) == set(expected.tolist()) - previous
+        assert set(delta.leaving.tolist()) == previous - set(expected.tolist())
+
+
+def test_star_at_the_limit_leaves_when_limit_drops():
+    """A star exactly at the limit is selected and removed again."""
+    stars = make_stars(1000)
+    session = StarChartSession(
+        StarIndex(stars, PLANET_RA, PLANET_DEC), "P", False, dpi=10
+    )
+    session.update(90.0, 7.3)
+    assert (stars.mag[session.selected] == 7.3).any()
+    session.update(90.0, 3.0)
+    assert (stars.mag[session.selected] <= 3.0).all()
+
+
+def test_incremental_render_matches_full_redraw():
+    """Drawing entering stars over the last raster equals a fresh chart."""
+    stars = make_stars(20_000)
+    session = StarChartSession(
+        StarIndex(stars, PLANET_RA, PLANET_DEC), "P", True, dpi=40
+    )
+    session.update(30.0, 2.0)
+    session.render(100)
+    for magnitude_limit in (4.0, 4.15, 6.0, 9.5):
+        delta = session.update(30.0, magnitude_limit)
+        assert delta.entering.size and not delta.leaving.size
+        image = session.render(100)
+
+        fresh = StarChartSession(
+            StarIndex(stars, PLANET_RA, PLANET_DEC), "P", True, dpi=40
+        )
+        fresh.update(30.0, magnitude_limit)
+        np.testing.assert_array_equal(image, fresh.render(100))
+
+
+def test_int_and_float_fov_render_alike():
+    """QML sends floats, Python callers ints, both must give the cached chart."""
+    stars = make_stars(1000)
+    index = StarIndex(stars, PLANET_RA, PLANET_DEC)
+    charts = []
+    for fov in (30, 30.0):
+        session = StarChartSession(index, "P", True, dpi=40)
+        session.update(fov, 8.0)
+        charts.append(session.render(100))
+    np.testing.assert_array_equal(*charts)
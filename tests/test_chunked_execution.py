@@ -0,0 +1,128 @@
+"""Tests for the chunked star array kernels."""
+
+from functools import partial
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.coordinates import Distance
+
+from backend import chunked_execution
+from backend.chunked_execution import (
+    chunk_bounds,
+    fov_half_width,
+    map_chunks,
+    parallax_to_distance,
+    process_map_chunks,
+    radec_to_cartesian,
+)
+
+
+@pytest.fixture(name="stars")
+def fixture_stars():
+    """Random cone, larger than one chunk and not a multiple of it."""
+    rng = np.random.default_rng(0)
+    n = 100_003
+    return {
+        "ra": rng.uniform(0, 360, n),
+        "dec": rng.uniform(-90, 90, n),
+        "parallax": rng.uniform(-1, 50, n),
+    }
+
+
+def test_chunk_bounds_cover_range():
+    """Blocks are contiguous and cover every index once."""
+    assert chunk_bounds(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert not chunk_bounds(0, 4)
+    with pytest.raises(ValueError):
+        chunk_bounds(10, 0)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_radec_to_cartesian_matches_numpy(stars, workers):
+    """Chunked transform gives the plain NumPy result."""
+    distance = 1000.0 / stars["parallax"]
+    origin = (1.0, -2.0, 3.0)
+    x, y, z = radec_to_cartesian(
+        stars["ra"], stars["dec"], distance, origin=origin, workers=workers
+    )
+
+    ra = np.radians(stars["ra"])
+    dec = np.radians(stars["dec"])
+    np.testing.assert_allclose(x, distance * np.cos(dec) * np.cos(ra) - origin[0])
+    np.testing.assert_allclose(y, distance * np.cos(dec) * np.sin(ra) - origin[1])
+    np.testing.assert_allclose(z, distance * np.sin(dec) - origin[2])
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_parallax_to_distance_matches_astropy(stars):
+    """Same distances as Distance(allow_negative=True), NaN for negative parallax."""
+    parallax = stars["parallax"].copy()
+    parallax[:3] = [0.0, -0.0, np.nan]
+    expected = Distance(parallax=parallax * u.mas, allow_negative=True).to_value(u.pc)
+
+    distance = parallax_to_distance(parallax)
+
+    assert np.isnan(distance[parallax < 0]).all()
+    np.testing.assert_allclose(distance, expected)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_fov_half_width_matches_numpy(stars, workers):
+    """Chunked FOV offsets give the plain NumPy result."""
+    half_width = fov_half_width(stars["ra"], stars["dec"], 45.0, -10.0, workers=workers)
+    np.testing.assert_array_equal(
+        half_width,
+        np.maximum(np.abs(stars["ra"] - 45.0), np.abs(stars["dec"] + 10.0)),
+    )
+
+
+def test_map_chunks_reraises_kernel_error():
+    """An exception inside a block reaches the caller."""
+
+    def kernel(values, out):
+        raise RuntimeError("broken block")
+
+    values = np.zeros(100)
+    with pytest.raises(RuntimeError, match="broken block"):
+        map_chunks(kernel, [values], [np.empty_like(values)], chunk_size=10)
+
+
+def test_map_chunks_rejects_mismatched_lengths():
+    """All arrays must have the same length."""
+    with pytest.raises(ValueError):
+        map_chunks(lambda a, b: None, [np.zeros(3)], [np.zeros(4)])
+
+
+def test_process_map_chunks_matches_threads(stars):
+    """The process pool over shared memory gives the thread pool result."""
+    distance = 1000.0 / stars["parallax"]
+    kernel = partial(
+        chunked_execution._radec_to_cartesian_kernel,  # pylint: disable=protected-access
+        (1.0, -2.0, 3.0),
+    )
+    expected = [np.empty_like(distance) for _ in range(3)]
+    map_chunks(kernel, [stars["ra"], stars["dec"], distance], expected)
+
+    actual = [np.empty_like(distance) for _ in range(3)]
+    process_map_chunks(kernel, [stars["ra"], stars["dec"], distance], actual, workers=2)
+    for actual_column, expected_column in zip(actual, expected):
+        np.testing.assert_array_equal(actual_column, expected_column)
+
+
+def test_process_map_chunks_reraises_kernel_error():
+    """A failing block in a worker process reaches the caller."""
+    parallax = np.zeros(100)
+    with pytest.raises(ValueError, match="broken block"):
+        process_map_chunks(
+            partial(failing_kernel, "broken block"),
+            [parallax],
+            [np.empty_like(parallax)],
+            chunk_size=10,
+            workers=2,
+        )
+
+
+def failing_kernel(message, values, out):
+    """Module level, so it can be pickled to the worker processes."""
+    raise ValueError(message)
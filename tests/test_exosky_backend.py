@@ -0,0 +1,87 @@
+"""Tests for the render cache integration of the backend."""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from backend.exosky_backend import ExoSkyBackend
+from backend.render_cache import RenderCache
+
+SELECT = {"planet": "P", "checked_earth_pov": True}
+STAR_CHART = {"star_size": 100, "magnitude_limit": 8, "fov": 30}
+
+
+@pytest.fixture(name="backend")
+def fixture_backend(catalogs):  # pylint: disable=unused-argument
+    """Backend counting how often a chart is really rendered."""
+    backend = ExoSkyBackend(cache=RenderCache())
+    backend.renders = 0
+    render_star_chart = backend._render_star_chart  # pylint: disable=protected-access
+
+    def counting_render(*args):
+        backend.renders += 1
+        return render_star_chart(*args)
+
+    backend._render_star_chart = counting_render  # pylint: disable=protected-access
+    return backend
+
+
+def test_same_chart_is_served_from_cache(backend):
+    """Asking again for a chart, with QML float spelling, does not render it again."""
+    image = backend.create_star_chart(SELECT, STAR_CHART)
+    again = backend.create_star_chart(
+        SELECT, {key: float(value) for key, value in STAR_CHART.items()}
+    )
+    assert again is image
+    assert backend.renders == 1
+    other = backend.create_star_chart(SELECT, {**STAR_CHART, "fov": 20})
+    assert backend.renders == 2
+    assert not np.array_equal(other, image)
+
+
+def test_changed_catalog_file_is_a_miss(backend, catalogs, write_cone):
+    """Rewriting a catalog file renders again from a new session."""
+    backend.create_star_chart(SELECT, STAR_CHART)
+    session = backend.star_chart_session(SELECT)
+    write_cone(catalogs["earth_cone"], 2)
+    stat = os.stat(catalogs["earth_cone"])
+    os.utime(catalogs["earth_cone"], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    backend.create_star_chart(SELECT, STAR_CHART)
+    assert backend.renders == 2
+    assert backend.star_chart_session(SELECT) is not session
+
+
+def test_invalidate_cache_drops_charts_and_sessions(backend):
+    """After invalidate_cache nothing rendered before is reused."""
+    backend.create_star_chart(SELECT, STAR_CHART)
+    session = backend.star_chart_session(SELECT)
+    backend.invalidate_cache()
+
+    assert backend.star_chart_session(SELECT) is not session
+    backend.create_star_chart(SELECT, STAR_CHART)
+    assert backend.renders == 2
+
+
+def test_only_the_active_session_is_kept(backend):
+    """Switching the point of view frees the raster of the previous session."""
+    backend.create_star_chart(SELECT, STAR_CHART)
+    earth_session = backend.star_chart_session(SELECT)
+    exo_select = {**SELECT, "checked_earth_pov": False}
+    backend.create_star_chart(exo_select, STAR_CHART)
+    exo_session = backend.star_chart_session(exo_select)
+
+    assert exo_session is not earth_session
+    assert earth_session._canvas.renderer is None  # pylint: disable=protected-access
+    assert backend.star_chart_session(exo_select) is exo_session
+
+
+def test_threed_chart_is_cached_as_json(backend):
+    """The 3D chart is plotly JSON and a hit returns it without serializing again."""
+    exo_select = {**SELECT, "checked_earth_pov": False}
+    fig_json = backend.create_threed_star_chart(exo_select, {"number_of_stars": 50})
+    assert json.loads(fig_json)["data"]
+    again = backend.create_threed_star_chart(exo_select, {"number_of_stars": 50.0})
+    assert again is fig_json
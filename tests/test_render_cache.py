@@ -0,0 +1,94 @@
+"""Tests for the star chart result cache."""
+
+import os
+
+import numpy as np
+
+from backend.render_cache import RenderCache, render_cache_key
+
+
+def test_key_is_canonical():
+    """Key order and int/float spelling from QML do not matter."""
+    first = render_cache_key(
+        "star_chart",
+        {"planet": "TOI-700 d", "checked_earth_pov": True},
+        {"fov": 30, "star_size": 100, "magnitude_limit": 8},
+        "v1",
+    )
+    second = render_cache_key(
+        "star_chart",
+        {"checked_earth_pov": True, "planet": "TOI-700 d"},
+        {"magnitude_limit": 8.0, "star_size": 100.0, "fov": 30.0},
+        "v1",
+    )
+    assert first == second
+    assert first != render_cache_key(
+        "star_chart",
+        {"planet": "TOI-700 d", "checked_earth_pov": True},
+        {"fov": 30, "star_size": 100, "magnitude_limit": 8},
+        "v2",
+    )
+
+
+def test_memory_budget_evicts_least_recently_used():
+    """Old entries go first once the byte budget is exceeded."""
+    cache = RenderCache(memory_budget=250)
+    cache.put("a", np.zeros(100, np.uint8))
+    cache.put("b", np.zeros(100, np.uint8))
+    cache.get("a")
+    cache.put("c", np.zeros(100, np.uint8))
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.stats()["memory_bytes"] == 200
+
+
+def test_cached_images_are_read_only():
+    """Images are shared between callers, so they cannot be modified."""
+    cache = RenderCache()
+    cache.put("image", np.zeros((2, 2, 4), np.uint8))
+    assert not cache.get("image").flags.writeable
+
+
+def test_threed_json_kept_as_text(tmp_path):
+    """3D charts are measured by their JSON and come back from disk unchanged."""
+    figure_json = '{"data": [{"type": "scatter3d", "x": [0.1]}]}'
+    cache = RenderCache(cache_dir=tmp_path)
+    cache.put("figure", figure_json)
+    assert cache.stats()["memory_bytes"] == len(figure_json)
+    assert RenderCache(cache_dir=tmp_path).get("figure") == figure_json
+
+
+def test_disk_store_survives_new_cache_and_invalidate(tmp_path):
+    """Results come back from disk and are removed by invalidate."""
+    RenderCache(cache_dir=tmp_path).put("image", np.ones((2, 2, 4), np.uint8))
+    cache = RenderCache(cache_dir=tmp_path)
+    assert cache.get("image").sum() == 16
+    cache.invalidate()
+    assert cache.get("image") is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_disk_entry_removed_by_another_process_is_a_miss(tmp_path, monkeypatch):
+    """A file deleted between lookup and read is a miss and is not recreated."""
+    cache = RenderCache(cache_dir=tmp_path)
+    cache.put("image", np.ones((2, 2, 4), np.uint8))
+    other = RenderCache(cache_dir=tmp_path)
+    path = other._disk_path("image")  # pylint: disable=protected-access
+    monkeypatch.setattr(other, "_disk_path", lambda key: path)
+    path.unlink()
+
+    assert other.get("image") is None
+    assert not path.exists()
+
+
+def test_disk_eviction_skips_files_removed_meanwhile(tmp_path, monkeypatch):
+    """Files evicted by another process do not break the disk budget pass."""
+    cache = RenderCache(memory_budget=0, cache_dir=tmp_path, disk_budget=300)
+    cache.put("a", np.zeros(100, np.uint8))
+    os.utime(tmp_path / "a.npy", (0, 0))
+    files = cache._disk_files  # pylint: disable=protected-access
+    monkeypatch.setattr(cache, "_disk_files", lambda: [*files(), tmp_path / "gone.npy"])
+    cache.put("b", np.zeros(100, np.uint8))
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
@@ -0,0 +1,59 @@
+"""Tests for the star column store."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.star_table import STAR_DTYPES, StarTable
+
+
+@pytest.fixture(name="table")
+def fixture_table():
+    """Three stars, two of them with a missing value."""
+    return StarTable(
+        {
+            "ra": [1.0, 2.0, 3.0],
+            "dec": [0.0, 1.0, np.nan],
+            "parallax": [1.0, 2.0, 3.0],
+            "phot_g_mean_mag": [5.0, 6.0, 7.0],
+            "distance_gspphot": [10.0, np.nan, 30.0],
+        }
+    )
+
+
+def test_columns_use_float64(table):
+    """Magnitudes are compared against float64 limits, so no column is narrower."""
+    for name in STAR_DTYPES:
+        assert table[name].dtype == np.float64
+
+
+def test_slices_are_views(table):
+    """Slicing does not copy the columns."""
+    assert np.shares_memory(table[:2].ra, table.ra)
+    assert len(table.head(2)) == 2
+
+
+def test_dropna(table):
+    """Stars with any missing value are dropped."""
+    cleaned = table.dropna()
+    assert len(cleaned) == 1
+    assert cleaned.ra.tolist() == [1.0]
+    assert cleaned.dropna() is cleaned
+
+
+def test_from_csv_reads_only_star_columns(tmp_path, table):
+    """The designation column is not loaded."""
+    df = table.to_dataframe()
+    df.insert(0, "designation", ["a", "b", "c"])
+    path = tmp_path / "cone.csv.gz"
+    df.to_csv(path, index=False, compression="gzip")
+
+    loaded = StarTable.from_csv(str(path))
+    assert list(loaded) == list(STAR_DTYPES)
+    pd.testing.assert_frame_equal(loaded.to_dataframe(), table.to_dataframe())
+
+
+def test_missing_column_is_rejected():
+    """All star columns are required."""
+    with pytest.raises(ValueError):
+        StarTable({"ra": [1.0]})